@@ -0,0 +1,95 @@
+"""Compare the threaded WSGI server with one Plaid call at a time, the same
+server with the Plaid calls fanned out concurrently, and the ASGI entry
+point under uvicorn.
+
+Uses the fake backends from load_test.py and requests the routes that make
+one Plaid call or more per linked item. Install the package first
+(``pip install -e .``), then run from the repository root:
+
+    python benchmarks/async_benchmark.py
+    python benchmarks/async_benchmark.py --items 8 --concurrency 4 16 --duration 10
+
+One call at a time is the behaviour before the async views, and can be
+reproduced in production with GSHEETS_PLAID_MAX_CONCURRENT_REQUESTS=1. The
+ASGI mode is skipped if the asgi extra (a2wsgi and uvicorn) isn't
+installed.
+"""
+import argparse
+import logging
+import socket
+import threading
+import time
+
+from load_test import BackendStats, HttpUser, create_app, run_level
+
+ROUTES = {
+    '/manage-plaid-items': 1,
+    '/refresh-status': 1,
+    '/sync': 1,
+}
+
+
+def start_wsgi_server(app) -> str:
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def start_asgi_server() -> str | None:
+    try:
+        import a2wsgi  # noqa: F401
+        import uvicorn
+    except ImportError:
+        return None
+    from gsheets_plaid.web_server.asgi import app
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    server.install_signal_handlers = lambda: None  # Not in the main thread
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f'http://127.0.0.1:{port}'
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to run each concurrency level.')
+    parser.add_argument('--items', type=int, default=4, help='Plaid items linked by each user.')
+    parser.add_argument('--transactions', type=int, default=100, help='Transactions per Plaid item.')
+    parser.add_argument('--plaid-latency', type=float, default=0.05, help='Seconds per Plaid call.')
+    parser.add_argument('--sheets-latency', type=float, default=0.08, help='Seconds per Sheets call.')
+    parser.add_argument('--max-concurrent-requests', type=int, default=8,
+        help='Plaid calls in flight at once per request in the concurrent modes.')
+    args = parser.parse_args(argv)
+    args.session_backend = 'sqlite'
+
+    stats = BackendStats({'plaid': args.plaid_latency, 'sheets': args.sheets_latency, 'firestore': 0, 'google': 0})
+    web_server = create_app(args, stats)
+    from gsheets_plaid import services
+
+    wsgi_url = start_wsgi_server(web_server.app)
+    modes = [
+        ('Threaded WSGI server, one Plaid call at a time', wsgi_url, 1),
+        ('Threaded WSGI server, concurrent Plaid calls', wsgi_url, args.max_concurrent_requests),
+    ]
+    asgi_url = start_asgi_server()
+    if asgi_url:
+        modes.append(('ASGI (uvicorn), concurrent Plaid calls', asgi_url, args.max_concurrent_requests))
+    else:
+        print('a2wsgi or uvicorn is not installed, skipping the ASGI mode')
+
+    for name, base_url, max_concurrent_requests in modes:
+        services.PLAID_MAX_CONCURRENT_REQUESTS = max_concurrent_requests
+        print(f'\n=== {name} ({args.items} items per user, Plaid {args.plaid_latency * 1000:.0f} ms per call)')
+        for concurrency in args.concurrency:
+            run_level(web_server, lambda: HttpUser(base_url), stats, concurrency, args.duration, ROUTES, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Report the cold import time of the gsheets_plaid modules and their heavy
+dependencies.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``
+so that nothing is shared between measurements. Install the package first
+(``pip install -e .``), then run from the repository root:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py gsheets_plaid.web_server.main --top 15
+"""
+import argparse
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    'gsheets_plaid',
+    'gsheets_plaid.cli',
+    'gsheets_plaid.services',
+    'gsheets_plaid.sync',
+    'gsheets_plaid.web_server.session_manager',
+    'gsheets_plaid.web_server.main',
+    'flask',
+    'numpy',
+    'pandas',
+    'plaid.api.plaid_api',
+    'googleapiclient.discovery',
+    'google_auth_oauthlib.flow',
+    'google.cloud.firestore',
+    'google.cloud.secretmanager',
+]
+
+
+def measure_import(module: str) -> list[tuple[str, int, int]] | None:
+    """Import a module in a fresh interpreter and return the
+    (package, self_us, cumulative_us) entries reported by -X importtime, or
+    None if the module cannot be imported. Nested imports keep their leading
+    indentation in the package name.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, package = line[len('import time:'):].split('|')
+        entries.append((package[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=3, help='Take the best of this many runs.')
+    parser.add_argument('--top', type=int, default=0, help='Also list the N slowest dependencies of each module.')
+    args = parser.parse_args(argv)
+
+    startup = {package for package, _, _ in measure_import('sys')}
+    print(f"{'module':<45} {'import time':>12}")
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.repeat)]
+        if any(entries is None for entries in runs):
+            print(f'{module:<45} {"not installed":>12}')
+            continue
+        # Leave out the modules every interpreter imports at startup
+        runs = [[entry for entry in entries if entry[0] not in startup] for entries in runs]
+        best = min(runs, key=lambda entries: sum(self_us for _, self_us, _ in entries))
+        total_ms = sum(self_us for _, self_us, _ in best) / 1000
+        print(f'{module:<45} {total_ms:>9.1f} ms')
+        if args.top:
+            direct_dependencies = sorted(
+                (entry for entry in best if entry[0].startswith('  ') and not entry[0].startswith('   ')),
+                key=lambda entry: entry[2],
+                reverse=True)
+            for package, _, cumulative_us in direct_dependencies[:args.top]:
+                print(f'    {package.strip():<41} {cumulative_us / 1000:>9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
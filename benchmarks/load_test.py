@@ -0,0 +1,514 @@
+"""Load test the web server routes against local stand-ins for Plaid, Google
+Sheets, Firestore and Google sign-in.
+
+Each virtual user signs in, then requests a mix of /, /manage-plaid-items,
+/manage-spreadsheets and /sync until the time is up. The fakes sleep for a
+configurable time per call to stand in for network latency, and count every
+call they receive. For each concurrency level the report lists the p50, p95
+and p99 latency and the throughput per route, and the backend calls made
+per request. Install the package first (``pip install -e .``), then run
+from the repository root:
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 1 8 32 --duration 20 --session-backend firestore
+    python benchmarks/load_test.py --server  # through a local threaded WSGI server
+
+By default requests go through the Flask test client in one thread per
+user. With --server they go over HTTP to a threaded werkzeug server, which
+adds the server's own overhead.
+"""
+import argparse
+import copy
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+ROUTE_WEIGHTS = {
+    '/': 60,
+    '/manage-plaid-items': 20,
+    '/manage-spreadsheets': 15,
+    '/sync': 5,
+}
+ACCOUNTS = [
+    ('checking', 'Plaid Checking', 'depository', 'checking'),
+    ('savings', 'Plaid Saving', 'depository', 'savings'),
+    ('credit', 'Plaid Credit Card', 'credit', 'credit card'),
+]
+MERCHANTS = ['Uber', 'Starbucks', 'United Airlines', "McDonald's", 'Sparkfun', 'KFC', 'Touchstone Climbing']
+
+
+class BackendStats:
+    """Counts the calls made to each fake backend, by the route that made
+    them, and sleeps to simulate each backend's latency.
+    """
+    def __init__(self, latencies: dict[str, float]) -> None:
+        self.latencies = latencies
+        self.calls = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def call(self, backend: str, method: str) -> None:
+        from flask import has_request_context, request
+        route = request.path if has_request_context() else 'setup'
+        with self.lock:
+            self.calls[route][f'{backend}.{method}'] += 1
+        time.sleep(self.latencies[backend])
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls = defaultdict(Counter)
+
+
+class FakeResponse(dict):
+    """Plaid responses support both item access and to_dict().
+    """
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+class FakePlaidClient:
+    """Stand-in for plaid_api.PlaidApi. Every access token has a fixed set of
+    transactions, so repeated syncs merge into the same rows.
+    """
+    def __init__(self, stats: BackendStats, num_transactions: int) -> None:
+        self.stats = stats
+        self.num_transactions = num_transactions
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def institutions_get(self, request: Any) -> FakeResponse:
+        self.stats.call('plaid', 'institutions_get')
+        return FakeResponse(institutions=[{'institution_id': 'ins_109508', 'name': 'First Platypus Bank'}])
+
+    def institutions_get_by_id(self, request: Any) -> FakeResponse:
+        self.stats.call('plaid', 'institutions_get_by_id')
+        return FakeResponse(institution={'institution_id': request.institution_id, 'name': 'First Platypus Bank'})
+
+    def item_get(self, request: Any) -> FakeResponse:
+        self.stats.call('plaid', 'item_get')
+        return FakeResponse(item=self.item(request.access_token))
+
+    def link_token_create(self, request: Any) -> FakeResponse:
+        self.stats.call('plaid', 'link_token_create')
+        return FakeResponse(link_token=f'link-sandbox-{random.getrandbits(64):016x}')
+
+    def item_public_token_exchange(self, request: Any) -> FakeResponse:
+        self.stats.call('plaid', 'item_public_token_exchange')
+        token_id = request.public_token.split('-')[-1]
+        return FakeResponse(access_token=f'access-sandbox-{token_id}', item_id=f'item-{token_id}')
+
+    def transactions_get(self, request: Any) -> FakeResponse:
+        self.stats.call('plaid', 'transactions_get')
+        with self.lock:
+            if request.access_token not in self.responses:
+                self.responses[request.access_token] = self.generate_transactions(request.access_token)
+        return FakeResponse(copy.deepcopy(self.responses[request.access_token]))
+
+    def item(self, access_token: str) -> dict:
+        return {
+            'item_id': 'item-' + access_token.split('-', 2)[-1],
+            'institution_id': 'ins_109508',
+            'consent_expiration_time': None,
+            'error': None,
+        }
+
+    def generate_transactions(self, access_token: str) -> dict:
+        rng = random.Random(access_token)
+        item = self.item(access_token)
+        accounts = [{
+            'account_id': f'{item["item_id"]}-{key}',
+            'balances': {'available': 100.0, 'current': 110.0, 'iso_currency_code': 'USD'},
+            'name': name,
+            'type': account_type,
+            'subtype': subtype,
+        } for key, name, account_type, subtype in ACCOUNTS]
+        transactions = []
+        for idx in range(self.num_transactions):
+            merchant = rng.choice(MERCHANTS)
+            transaction_date = date.today() - timedelta(days=rng.randint(0, 29))
+            transactions.append({
+                'transaction_id': f'{item["item_id"]}-{idx}',
+                'pending_transaction_id': None,
+                'pending': idx < 3,
+                'account_id': rng.choice(accounts)['account_id'],
+                'date': transaction_date,
+                'datetime': datetime.combine(transaction_date, datetime.min.time()) + timedelta(hours=12),
+                'name': merchant.upper(),
+                'merchant_name': merchant,
+                'amount': round(rng.uniform(1, 500), 2),
+                'iso_currency_code': 'USD',
+                'unofficial_currency_code': None,
+                'payment_channel': 'in store',
+                'category_id': '13005000',
+                'category': ['Food and Drink', 'Restaurants'],
+                'personal_finance_category': {'primary': 'FOOD_AND_DRINK', 'detailed': 'FOOD_AND_DRINK_RESTAURANT'},
+                'location': {'city': 'San Francisco', 'region': 'CA', 'postal_code': '94103', 'country': 'US'},
+            })
+        return {'accounts': accounts, 'transactions': transactions, 'item': item}
+
+
+class FakeRequest:
+    def __init__(self, stats: BackendStats, method: str, result: Callable[[], Any]) -> None:
+        self.stats = stats
+        self.method = method
+        self.result = result
+
+    def execute(self) -> Any:
+        self.stats.call('sheets', self.method)
+        return self.result()
+
+
+class FakeSheetsService:
+    """Stand-in for the Sheets API resource, storing each spreadsheet's values
+    in memory as the text the API would return.
+    """
+    def __init__(self, stats: BackendStats) -> None:
+        self.stats = stats
+        self.spreadsheets_store = {}
+        self.lock = threading.Lock()
+
+    def spreadsheets(self) -> 'FakeSheetsService':
+        return self
+
+    def values(self) -> 'FakeSheetsService':
+        return self
+
+    def sheet_values(self, spreadsheet_id: str) -> list[list[str]]:
+        return self.spreadsheets_store.setdefault(spreadsheet_id, [])
+
+    def create(self, body: dict) -> FakeRequest:
+        spreadsheet_id = f'spreadsheet-{random.getrandbits(64):016x}'
+        return FakeRequest(self.stats, 'create', lambda: {'spreadsheetId': spreadsheet_id})
+
+    def get(self, spreadsheetId: str, range: str | None = None, fields: str | None = None) -> FakeRequest:
+        if range is None:
+            def get_spreadsheet() -> dict:
+                with self.lock:
+                    row_count = max(1000, len(self.sheet_values(spreadsheetId)))
+                return {
+                    'spreadsheetId': spreadsheetId,
+                    'spreadsheetUrl': f'https://docs.google.com/spreadsheets/d/{spreadsheetId}',
+                    'properties': {'title': 'Finance Tracker'},
+                    'sheets': [{'properties': {
+                        'title': 'Sheet1', 'sheetId': 0, 'gridProperties': {'rowCount': row_count}}}],
+                }
+            return FakeRequest(self.stats, 'get', get_spreadsheet)
+
+        def get_values() -> dict:
+            with self.lock:
+                values = self.sheet_values(spreadsheetId)
+                return {'values': values[:1]} if range.endswith('!1:1') and values else {}
+        return FakeRequest(self.stats, 'values.get', get_values)
+
+    def batchGet(self, spreadsheetId: str, ranges: list[str]) -> FakeRequest:
+        def batch_get() -> dict:
+            value_ranges = []
+            with self.lock:
+                values = self.sheet_values(spreadsheetId)
+                for cell_range in ranges:
+                    start_row, end_row = map(int, re.search(r'!A(\d+):[A-Z]+(\d+)$', cell_range).groups())
+                    rows = [list(row) for row in values[start_row - 1:end_row]]
+                    while rows and not any(rows[-1]):
+                        rows.pop()
+                    value_ranges.append({'range': cell_range, 'values': rows} if rows else {'range': cell_range})
+            return {'valueRanges': value_ranges}
+        return FakeRequest(self.stats, 'values.batchGet', batch_get)
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: dict) -> FakeRequest:
+        def update_values() -> dict:
+            with self.lock:
+                values = [[cell_text(cell) for cell in row] for row in body['values']]
+                if range.endswith('!A1') and len(values) == 1:
+                    self.sheet_values(spreadsheetId)[:1] = values
+                else:
+                    self.spreadsheets_store[spreadsheetId] = values
+            return {}
+        return FakeRequest(self.stats, 'values.update', update_values)
+
+    def append(
+            self,
+            spreadsheetId: str,
+            range: str,
+            valueInputOption: str,
+            insertDataOption: str,
+            body: dict) -> FakeRequest:
+        def append_values() -> dict:
+            with self.lock:
+                self.sheet_values(spreadsheetId).extend([[cell_text(cell) for cell in row] for row in body['values']])
+            return {}
+        return FakeRequest(self.stats, 'values.append', append_values)
+
+    def batchUpdate(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        return FakeRequest(self.stats, 'batchUpdate', lambda: {})
+
+
+def cell_text(cell: Any) -> str:
+    if isinstance(cell, bool):
+        return str(cell).upper()
+    return '' if cell is None else str(cell)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, data: dict | None) -> None:
+        self.data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self.data)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: 'FakeFirestoreClient', document_id: str) -> None:
+        self.client = client
+        self.document_id = document_id
+
+    def get(self) -> FakeDocumentSnapshot:
+        self.client.stats.call('firestore', 'get')
+        with self.client.lock:
+            return FakeDocumentSnapshot(self.client.documents.get(self.document_id))
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        self.client.stats.call('firestore', 'set')
+        with self.client.lock:
+            if merge:
+                self.client.documents.setdefault(self.document_id, {}).update(copy.deepcopy(data))
+            else:
+                self.client.documents[self.document_id] = copy.deepcopy(data)
+
+    def update(self, data: dict) -> None:
+        from google.cloud import firestore
+        self.client.stats.call('firestore', 'update')
+        with self.client.lock:
+            document = self.client.documents[self.document_id]
+            for key, value in data.items():
+                if value is firestore.DELETE_FIELD:
+                    document.pop(key, None)
+                else:
+                    document[key] = copy.deepcopy(value)
+
+    def delete(self) -> None:
+        self.client.stats.call('firestore', 'delete')
+        with self.client.lock:
+            self.client.documents.pop(self.document_id, None)
+
+
+class FakeFirestoreClient:
+    """Stand-in for firestore.Client with a single in-memory collection.
+    """
+    def __init__(self, stats: BackendStats) -> None:
+        self.stats = stats
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def collection(self, name: str) -> 'FakeFirestoreClient':
+        return self
+
+    def document(self, document_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, document_id)
+
+
+class FakeIdToken:
+    """Stand-in for google.oauth2.id_token. The token is the user id.
+    """
+    def __init__(self, stats: BackendStats) -> None:
+        self.stats = stats
+
+    def verify_oauth2_token(self, token: str, request: Any, audience: str) -> dict:
+        self.stats.call('google', 'verify_oauth2_token')
+        return {'sub': token, 'given_name': 'Load'}
+
+
+def create_app(args: argparse.Namespace, stats: BackendStats) -> Any:
+    """Import the web server with every external service replaced by a fake.
+    """
+    os.environ.setdefault('GOOGLE_CLOUD_CLIENT_ID', 'load-test')
+    os.environ.setdefault('GOOGLE_CLOUD_CLIENT_CONFIG', '{}')
+    os.environ.setdefault('FLASK_SECRET_KEY', 'load-test')
+    os.environ.setdefault('GOOGLE_APPLICATION_CREDENTIALS', os.devnull)
+    os.environ.pop('GOOGLE_CLOUD_PROJECT', None)
+    os.environ['GSHEETS_PLAID_SESSION_BACKEND'] = 'sqlite'
+    os.environ['GSHEETS_PLAID_SESSION_DB'] = os.path.join(tempfile.mkdtemp(), 'sessions.db')
+    os.environ['GSHEETS_PLAID_INSECURE_COOKIES'] = '1'  # --server uses plain HTTP
+
+    from gsheets_plaid.web_server import main as web_server
+    from gsheets_plaid.web_server.session_manager import FirestoreSessionManager
+
+    if args.session_backend == 'firestore':
+        web_server.session_manager = FirestoreSessionManager(FakeFirestoreClient(stats))
+    plaid_client = FakePlaidClient(stats, args.transactions)
+    gsheets_service = FakeSheetsService(stats)
+    web_server.generate_plaid_client = lambda plaid_env, client_id, secret: plaid_client
+    web_server.generate_gsheets_service = lambda credentials: gsheets_service
+    web_server.id_token = FakeIdToken(stats)
+    return web_server
+
+
+def seed_user(web_server: Any, user_id: str, num_items: int) -> None:
+    """Give a signed in user Plaid credentials, linked items, Google
+    credentials and a spreadsheet.
+    """
+    with web_server.app.test_request_context():
+        web_server.session_manager.register_user_id(user_id)
+        session_data = web_server.session_manager.get_session()
+        session_data.update({
+            'plaid_env': 'sandbox',
+            'plaid_client_id': 'load-test-client-id',
+            'plaid_secret': 'load-test-secret',
+            'plaid_items': {f'item-{user_id}-{idx}': f'access-sandbox-{user_id}-{idx}' for idx in range(num_items)},
+            'google_credentials': {
+                'token': 'load-test-token',
+                'refresh_token': 'load-test-refresh-token',
+                'client_id': 'load-test-client-id',
+                'client_secret': 'load-test-client-secret',
+                'expiry': (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            },
+            'spreadsheet_id': f'spreadsheet-{user_id}',
+            'spreadsheet_url': f'https://docs.google.com/spreadsheets/d/spreadsheet-{user_id}',
+        })
+        web_server.session_manager.set_session(session_data)
+        web_server.session_manager.flush()
+
+
+class TestClientUser:
+    def __init__(self, app: Any) -> None:
+        self.client = app.test_client()
+
+    def get(self, path: str) -> int:
+        return self.client.get(path).status_code
+
+
+class HttpUser:
+    def __init__(self, base_url: str) -> None:
+        import requests
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get(self, path: str) -> int:
+        return self.session.get(self.base_url + path, allow_redirects=False).status_code
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_level(
+        web_server: Any,
+        make_user: Callable[[], Any],
+        stats: BackendStats,
+        concurrency: int,
+        duration: float,
+        routes: dict[str, int],
+        args: argparse.Namespace) -> None:
+    """Run ``concurrency`` users for ``duration`` seconds and print the
+    results.
+    """
+    users = []
+    for idx in range(concurrency):
+        user_id = f'user{concurrency}x{idx}'
+        user = make_user()
+        user.get(f'/sign-in-with-google-callback?jwt={user_id}')
+        seed_user(web_server, user_id, args.items)
+        user.get('/')  # Take the first status snapshot
+        users.append(user)
+    stats.reset()
+
+    results = defaultdict(list)
+    errors = Counter()
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker(user: Any, seed: int) -> None:
+        rng = random.Random(seed)
+        paths, weights = list(routes), list(routes.values())
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            path = rng.choices(paths, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = user.get(path)
+            except Exception:
+                status = None
+            latency = time.perf_counter() - start
+            with lock:
+                results[path].append(latency)
+                if status is None or status >= 500:
+                    errors[path] += 1
+
+    threads = [threading.Thread(target=worker, args=(user, idx), daemon=True) for idx, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(map(len, results.values()))
+    print(f'\n{concurrency} concurrent users: {total} requests in {elapsed:.1f} s, {total / elapsed:.1f} req/s')
+    print(f"{'route':<22} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}  backend calls per request")
+    for path in routes:
+        latencies = sorted(results[path])
+        if not latencies:
+            continue
+        calls = ', '.join(
+            f'{name} {count / len(latencies):.1f}' for name, count in sorted(stats.calls[path].items()))
+        print(
+            f'{path:<22} {len(latencies):>6} {errors[path]:>6} '
+            f'{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} '
+            f'{percentile(latencies, 0.99) * 1000:>8.1f} {len(latencies) / elapsed:>7.1f}  {calls or "-"}')
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+        help='Numbers of concurrent users to run, one level after another.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to run each concurrency level.')
+    parser.add_argument('--routes', nargs='+', choices=list(ROUTE_WEIGHTS), default=list(ROUTE_WEIGHTS),
+        help='Only request these routes (keeping their relative weights).')
+    parser.add_argument('--session-backend', choices=['sqlite', 'firestore'], default='sqlite')
+    parser.add_argument('--server', action='store_true', help='Send requests over HTTP to a local threaded server.')
+    parser.add_argument('--items', type=int, default=2, help='Plaid items linked by each user.')
+    parser.add_argument('--transactions', type=int, default=100, help='Transactions per Plaid item.')
+    parser.add_argument('--plaid-latency', type=float, default=0.05, help='Seconds per Plaid call.')
+    parser.add_argument('--sheets-latency', type=float, default=0.08, help='Seconds per Sheets call.')
+    parser.add_argument('--firestore-latency', type=float, default=0.01, help='Seconds per Firestore call.')
+    args = parser.parse_args(argv)
+
+    stats = BackendStats({
+        'plaid': args.plaid_latency,
+        'sheets': args.sheets_latency,
+        'firestore': args.firestore_latency,
+        'google': 0,
+    })
+    web_server = create_app(args, stats)
+    routes = {path: ROUTE_WEIGHTS[path] for path in args.routes}
+
+    if args.server:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, web_server.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        make_user = lambda: HttpUser(base_url)
+    else:
+        make_user = lambda: TestClientUser(web_server.app)
+
+    print(
+        f'Session backend {args.session_backend}, {"HTTP server" if args.server else "Flask test client"}, '
+        f'latency per call: Plaid {args.plaid_latency * 1000:.0f} ms, Sheets {args.sheets_latency * 1000:.0f} ms, '
+        f'Firestore {args.firestore_latency * 1000:.0f} ms')
+    for concurrency in args.concurrency:
+        run_level(web_server, make_user, stats, concurrency, args.duration, routes, args)
+
+
+if __name__ == '__main__':
+    main()
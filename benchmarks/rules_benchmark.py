@@ -0,0 +1,111 @@
+"""Time the categorization rules on synthetic transactions and check the
+result against testing each rule in order, row by row.
+
+The baseline is slow, so it is run on a sample of the rows. Install the package
+first (``pip install -e .``), then run from the repository root:
+
+    python benchmarks/rules_benchmark.py
+    python benchmarks/rules_benchmark.py --rows 100000 --rules 1000 --merchants 20000
+"""
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+
+from gsheets_plaid.rules import RULE_TEXT_FIELDS, CategoryRule, RuleSet
+
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choices(string.ascii_uppercase, k=rng.randint(4, 9)))
+
+
+def generate_rules(rng: random.Random, num_rules: int, vocabulary: list[str]) -> list[CategoryRule]:
+    """Mostly single-word merchant and name rules, like the REGEXMATCH
+    formulas they replace, with some amount ranges and multi-field rules.
+    """
+    rules = []
+    for idx in range(num_rules):
+        options = {}
+        kind = rng.random()
+        if kind < 0.5:
+            options['merchant_name'] = rng.choice(vocabulary)
+        elif kind < 0.75:
+            options['name'] = '|'.join(rng.sample(vocabulary, 2))
+        elif kind < 0.9:
+            options['name'] = '^' + rng.choice(vocabulary)
+            options['min_amount'] = rng.randint(0, 200)
+            options['max_amount'] = options['min_amount'] + rng.randint(10, 500)
+        elif kind < 0.98:
+            options['merchant_name'] = rng.choice(vocabulary)
+            options['account_name'] = rng.choice(['checking', 'credit', 'savings'])
+        else:
+            options['min_amount'] = rng.randint(1000, 5000)
+        rules.append(CategoryRule(f'Category {idx}', **options))
+    return rules
+
+
+def generate_rows(
+        rng: random.Random,
+        num_rows: int,
+        num_merchants: int,
+        vocabulary: list[str]) -> tuple[dict[str, list[str]], np.ndarray]:
+    merchants = [' '.join(rng.choices(vocabulary, k=2)) for _ in range(num_merchants)]
+    accounts = ['Plaid Checking', 'Plaid Credit Card', 'Plaid Savings']
+    texts = {field: [] for field in RULE_TEXT_FIELDS}
+    for _ in range(num_rows):
+        merchant = rng.choice(merchants)
+        texts['merchant_name'].append(merchant)
+        texts['name'].append(f'{merchant} #{rng.randint(1, 99)}')
+        texts['account_name'].append(rng.choice(accounts))
+    amounts = np.round(np.array([rng.lognormvariate(3.5, 1.2) for _ in range(num_rows)]), 2)
+    return texts, amounts
+
+
+def categorize_sequentially(rules: list[CategoryRule], texts: dict[str, list[str]], amount: float) -> str | None:
+    for rule in rules:
+        if rule.matches(texts, amount):
+            return rule.category
+    return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--rules', type=int, default=1000)
+    parser.add_argument('--merchants', type=int, default=5000, help='Number of distinct merchant names.')
+    parser.add_argument('--sample', type=int, default=2000, help='Rows checked with the row-by-row baseline.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    vocabulary = [random_word(rng) for _ in range(args.rules * 2)]
+    rules = generate_rules(rng, args.rules, vocabulary)
+    texts, amounts = generate_rows(rng, args.rows, args.merchants, vocabulary)
+
+    start = time.perf_counter()
+    rule_set = RuleSet(rules)
+    compile_s = time.perf_counter() - start
+    start = time.perf_counter()
+    categories = rule_set.categorize(texts, amounts)
+    categorize_s = time.perf_counter() - start
+    num_matched = sum(category is not None for category in categories)
+
+    sample = rng.sample(range(args.rows), min(args.sample, args.rows))
+    start = time.perf_counter()
+    expected = [
+        categorize_sequentially(rules, {field: texts[field][row] for field in texts}, amounts[row])
+        for row in sample]
+    baseline_s = (time.perf_counter() - start) * args.rows / len(sample)
+    mismatches = sum(categories[row] != category for row, category in zip(sample, expected))
+
+    print(f'{args.rows} rows, {args.rules} rules, {args.merchants} merchants')
+    print(f'compile rules        {compile_s * 1000:>10.1f} ms')
+    print(f'categorize           {categorize_s * 1000:>10.1f} ms  ({num_matched} rows matched)')
+    print(f'row by row (est.)    {baseline_s * 1000:>10.1f} ms')
+    print(f'mismatches           {mismatches:>10} of {len(sample)} sampled rows')
+
+
+if __name__ == '__main__':
+    main()
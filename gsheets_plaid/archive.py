@@ -0,0 +1,93 @@
+"""Local, append-only archive of the raw Plaid transactions_get responses.
+
+Every response fetched during a sync is kept, so the sheet can be rebuilt
+offline (eg. after the columns or normalization change) without going back
+to Plaid, and history older than Plaid's window isn't lost.
+"""
+import gzip
+import heapq
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator
+
+from gsheets_plaid.atomic import AtomicFile
+
+ARCHIVE_SUFFIX = '.json.gz'
+ARCHIVE_TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S%f'
+
+
+class TransactionArchive:
+    """Raw responses stored as gzipped JSON under ``<directory>/<item_id>``,
+    one file per response named after when it was fetched and the date range
+    that was requested.
+
+    Files are written atomically and never changed afterwards, so an
+    interrupted sync can't damage what is already archived.
+    """
+    def __init__(self, directory: str) -> None:
+        self.directory = os.path.expanduser(directory)
+
+    def item_path(self, item_id: str) -> str:
+        return os.path.join(self.directory, item_id)
+
+    def append(self, response: dict, institution: dict, num_days: int) -> None:
+        archived_at = datetime.now()
+        start_date = (archived_at - timedelta(days=num_days)).date()
+        end_date = archived_at.date()
+        record = {
+            'archived_at': archived_at.isoformat(),
+            'start_date': start_date,
+            'end_date': end_date,
+            'response': response,
+            'institution': institution,
+        }
+        data = gzip.compress(json.dumps(record, default=encode_value, separators=(',', ':')).encode())
+
+        # The archive holds transaction data, so keep it private to the user
+        item_path = self.item_path(response['item']['item_id'])
+        os.makedirs(item_path, mode=0o700, exist_ok=True)
+        name = f'{archived_at.strftime(ARCHIVE_TIMESTAMP_FORMAT)}_{start_date}_{end_date}{ARCHIVE_SUFFIX}'
+        with AtomicFile(os.path.join(item_path, name)) as file:
+            file.write(data)
+
+    def item_ids(self) -> list[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if os.path.isdir(self.item_path(name)))
+
+    def iter_item_records(self, item_id: str) -> Iterator[dict]:
+        """Yield an item's records, oldest first.
+        """
+        item_path = self.item_path(item_id)
+        for name in sorted(os.listdir(item_path)):
+            if name.endswith(ARCHIVE_SUFFIX):
+                with gzip.open(os.path.join(item_path, name), 'rt') as file:
+                    yield json.load(file, object_hook=decode_value)
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yield the records of every item in the order they were archived.
+        """
+        yield from heapq.merge(
+            *(self.iter_item_records(item_id) for item_id in self.item_ids()),
+            key=lambda record: record['archived_at'])
+
+
+def encode_value(value: Any) -> Any:
+    """JSON encoding for the values in Plaid responses that JSON can't hold.
+    Dates and datetimes are tagged so they are restored with their type.
+    """
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    return str(value)
+
+
+def decode_value(obj: dict) -> Any:
+    if len(obj) == 1:
+        if '$datetime' in obj:
+            return datetime.fromisoformat(obj['$datetime'])
+        if '$date' in obj:
+            return date.fromisoformat(obj['$date'])
+    return obj
@@ -0,0 +1,47 @@
+"""Atomic local file writes, shared by the sync checkpoints, the response
+archive and the file sinks.
+"""
+import os
+import tempfile
+from typing import IO, Any
+
+
+class AtomicFile:
+    """A temporary file next to ``path`` that replaces ``path`` in one step
+    once committed, or is removed if discarded. Readers of ``path`` never see
+    a partly written file.
+
+    Used as a context manager, it yields the open file and commits when the
+    block succeeds, or discards the file when the block raises.
+    """
+    def __init__(self, path: str, mode: str = 'wb', **open_kwargs: Any) -> None:
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            self.file = os.fdopen(fd, mode, **open_kwargs)
+        except BaseException:
+            os.close(fd)
+            os.remove(self.tmp_path)
+            raise
+
+    def commit(self) -> None:
+        try:
+            self.file.close()
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self) -> IO:
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
@@ -0,0 +1,54 @@
+"""Daily account balance snapshots, taken from the accounts that Plaid
+already returns with every transactions_get response.
+
+Each sync adds one row per account and day, so the balance history builds
+up without calling /accounts/balance/get.
+"""
+from datetime import date
+
+BALANCES_SHEET = 'Balances'
+BALANCE_COLS = [
+    'date',
+    'account_id',
+    'account_name',
+    'institution_name',
+    'current',
+    'available',
+    'currency',
+]
+BALANCE_KEY_COLS = ['date', 'account_id']
+
+
+def balance_rows(transaction_response: dict, institution: dict, snapshot_date: date) -> list[list]:
+    """One row of BALANCE_COLS per account in a transactions_get response.
+    Missing balances are left blank.
+    """
+    rows = []
+    for account in transaction_response.get('accounts') or []:
+        balances = account.get('balances') or {}
+        currency = balances.get('iso_currency_code') or balances.get('unofficial_currency_code')
+        rows.append([
+            snapshot_date.isoformat(),
+            account.get('account_id'),
+            account.get('name'),
+            (institution or {}).get('name'),
+            balances.get('current'),
+            balances.get('available'),
+            currency,
+        ])
+    return [['' if cell is None else cell for cell in row] for row in rows]
+
+
+def new_balance_rows(rows: list[list], existing_keys: set[tuple[str, str]]) -> list[list]:
+    """Drop the rows whose (date, account_id) is already in ``existing_keys``
+    or earlier in ``rows``, so the first snapshot of each day is kept.
+    """
+    key_idxs = [BALANCE_COLS.index(col) for col in BALANCE_KEY_COLS]
+    seen = set(existing_keys)
+    new_rows = []
+    for row in rows:
+        key = tuple(str(row[idx]) for idx in key_idxs)
+        if key not in seen:
+            seen.add(key)
+            new_rows.append(row)
+    return new_rows
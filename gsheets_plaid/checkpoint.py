@@ -0,0 +1,92 @@
+"""Local checkpoints that let a failed sync resume where it stopped instead
+of fetching everything from Plaid again.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Any
+
+from gsheets_plaid.atomic import AtomicFile
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gsheets_plaid', 'checkpoints')
+# Runs that haven't been touched for this long are deleted by prune_checkpoints
+CHECKPOINT_MAX_AGE = timedelta(days=7)
+
+
+class SyncCheckpoint:
+    """Intermediate results of one sync run, stored under
+    ``<directory>/<run_id>``.
+
+    Each stage is pickled to its own file and written atomically, so a
+    stage is either fully saved or missing.
+    """
+    def __init__(self, run_id: str | None = None, directory: str | None = None) -> None:
+        self.run_id = run_id or uuid.uuid4().hex
+        self.path = os.path.join(directory or DEFAULT_CHECKPOINT_DIR, self.run_id)
+
+    def stage_path(self, stage: str) -> str:
+        return os.path.join(self.path, f'{stage}.pickle')
+
+    def has(self, stage: str) -> bool:
+        return os.path.isfile(self.stage_path(stage))
+
+    def load(self, stage: str) -> Any:
+        with open(self.stage_path(stage), 'rb') as file:
+            return pickle.load(file)
+
+    def save(self, stage: str, value: Any = None) -> None:
+        # Checkpoints hold transaction data, so keep them private to the user
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        with AtomicFile(self.stage_path(stage)) as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def check_inputs(self, inputs: Any) -> None:
+        """Save the settings of a new run, or make sure that a resumed run
+        has the same settings as the attempt that saved the checkpoint.
+        """
+        if not self.has('inputs'):
+            self.save('inputs', inputs)
+        elif self.load('inputs') != inputs:
+            raise ValueError(
+                f'Checkpoint {self.run_id} was saved by a sync with different settings, it cannot be resumed.')
+
+
+def sync_run_id(
+        spreadsheet_id: str,
+        access_tokens: list[str],
+        num_days: int,
+        differential: bool,
+        day: date | None = None) -> str:
+    """Run id derived from a sync's settings and the day it runs, so running
+    the same sync again on the same day resumes it.
+    """
+    inputs = [spreadsheet_id, sorted(access_tokens), num_days, differential, (day or date.today()).isoformat()]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()[:32]
+
+
+def prune_checkpoints(directory: str | None = None, max_age: timedelta = CHECKPOINT_MAX_AGE) -> None:
+    """Delete the checkpoints of failed runs that haven't been touched for
+    ``max_age``, since they hold raw transaction data.
+    """
+    directory = directory or DEFAULT_CHECKPOINT_DIR
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - max_age.total_seconds()
+    for entry in os.scandir(directory):
+        if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def fetch_stage(access_token: str) -> str:
+    """Checkpoint stage name for an access token's Plaid response. The token
+    is hashed so that it doesn't end up in a filename.
+    """
+    return 'fetch-' + hashlib.sha256(access_token.encode()).hexdigest()[:16]
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+
+SYNC_CONFIG_ENV_VARIABLES = {
+    'plaid_env': 'PLAID_ENV',
+    'plaid_client_id': 'PLAID_CLIENT_ID',
+    'plaid_secret': 'PLAID_SECRET',
+    'google_credentials': 'GOOGLE_CREDENTIALS',
+    'spreadsheet_id': 'SPREADSHEET_ID',
+    'plaid_access_tokens': 'PLAID_ACCESS_TOKENS',
+    'archive_dir': 'GSHEETS_PLAID_ARCHIVE_DIR',
+}
+REQUIRED_SYNC_CONFIG_KEYS = (
+    'plaid_client_id',
+    'plaid_secret',
+    'google_credentials',
+    'spreadsheet_id',
+)
+REQUIRED_REPLAY_CONFIG_KEYS = (
+    'google_credentials',
+    'spreadsheet_id',
+)
+
+
+def load_sync_config(
+        config_path: str | None = None,
+        required_keys: tuple[str, ...] = REQUIRED_SYNC_CONFIG_KEYS) -> dict:
+    """Load the settings needed for a headless sync.
+
+    Values are read from a JSON config file (which may be a copy of the web
+    server's session data) and missing values are filled in from environment
+    variables.
+    """
+    config = {}
+    if config_path:
+        with open(config_path, 'r') as file:
+            config = json.load(file)
+    for key, env_variable in SYNC_CONFIG_ENV_VARIABLES.items():
+        if key not in config and env_variable in os.environ:
+            config[key] = os.environ[env_variable]
+    missing_keys = [key for key in required_keys if not config.get(key)]
+    if missing_keys:
+        env_variables = [SYNC_CONFIG_ENV_VARIABLES[key] for key in missing_keys]
+        raise EnvironmentError(
+            f'Missing sync settings {missing_keys}. Set them in the config file or with the '
+            f'environment variables {env_variables}.')
+    config.setdefault('plaid_env', 'sandbox')
+    return config
+
+
+def get_access_tokens(config: dict) -> list[str]:
+    """Get the Plaid access tokens for the configured Plaid environment.
+
+    Accepts either a 'plaid_items' mapping of item ids to access tokens (as
+    stored by the web server) or a 'plaid_access_tokens' list or
+    comma-separated string.
+    """
+    access_tokens = config.get('plaid_access_tokens', [])
+    if isinstance(access_tokens, str):
+        access_tokens = [token.strip() for token in access_tokens.split(',') if token.strip()]
+    access_tokens = list(access_tokens) + list(config.get('plaid_items', {}).values())
+    plaid_env = config['plaid_env']
+    return [token for token in access_tokens if token.lower().startswith(f'access-{plaid_env}')]
+
+
+def run_sync(
+        config: dict,
+        num_days: int | None = None,
+        differential: bool = False,
+        run_id: str | None = None) -> None:
+    """Sync transactions straight to Google Sheets without the web server.
+
+    Progress is checkpointed under ``run_id``, which by default is derived
+    from the settings and today's date. If the sync fails, running it again
+    the same day (or with the same run id) resumes where it stopped.
+    Checkpoints of old failed runs are deleted. If 'archive_dir' is set, the
+    raw Plaid responses are archived there for run_replay. If
+    'balances_sheet' is set, daily account balances are added to that sheet.
+    """
+    from gsheets_plaid.archive import TransactionArchive
+    from gsheets_plaid.checkpoint import SyncCheckpoint, prune_checkpoints, sync_run_id
+    from gsheets_plaid.rules import build_rules
+    from gsheets_plaid.services import generate_gsheets_service, generate_plaid_client
+    from gsheets_plaid.sinks import build_sinks
+    from gsheets_plaid.sync import sync_transactions
+
+    access_tokens = get_access_tokens(config)
+    if not access_tokens:
+        raise ValueError(f"No Plaid access tokens found for the '{config['plaid_env']}' environment.")
+    if num_days is None:
+        num_days = int(config.get('num_days', 30))
+    gsheets_service = generate_gsheets_service(config['google_credentials'])
+    plaid_client = generate_plaid_client(config['plaid_env'], config['plaid_client_id'], config['plaid_secret'])
+    differential = differential or bool(config.get('differential'))
+    prune_checkpoints()
+    checkpoint = SyncCheckpoint(
+        run_id or sync_run_id(config['spreadsheet_id'], access_tokens, num_days, differential))
+    sinks = build_sinks(config.get('sinks', []))
+    rules = build_rules(config.get('rules', []))
+    archive = TransactionArchive(config['archive_dir']) if config.get('archive_dir') else None
+    try:
+        sync_transactions(gsheets_service, plaid_client, access_tokens, config['spreadsheet_id'], num_days,
+            differential=differential, checkpoint=checkpoint, sinks=sinks, rules=rules, archive=archive,
+            balances_sheet=config.get('balances_sheet'))
+    except Exception:
+        print(f'Sync failed. Run it again today, or with --run-id {checkpoint.run_id}, to resume where it stopped.')
+        raise
+
+
+def run_replay(config: dict, archive_dir: str | None = None) -> None:
+    """Rebuild the sheet from the archived Plaid responses, without calling
+    Plaid. The current rules and output sinks are applied, and the archived
+    balances are added to 'balances_sheet' if it is set.
+    """
+    from gsheets_plaid.archive import TransactionArchive
+    from gsheets_plaid.rules import build_rules
+    from gsheets_plaid.services import generate_gsheets_service
+    from gsheets_plaid.sinks import build_sinks
+    from gsheets_plaid.sync import replay_transactions
+
+    archive_dir = archive_dir or config.get('archive_dir')
+    if not archive_dir:
+        raise ValueError('Set archive_dir in the config file or pass --archive-dir.')
+    archive = TransactionArchive(archive_dir)
+    if not archive.item_ids():
+        raise ValueError(f'No archived Plaid responses found in {archive.directory}.')
+    gsheets_service = generate_gsheets_service(config['google_credentials'])
+    replay_transactions(gsheets_service, archive, config['spreadsheet_id'],
+        sinks=build_sinks(config.get('sinks', [])), rules=build_rules(config.get('rules', [])),
+        balances_sheet=config.get('balances_sheet'))
+
+
+def run_web_server(open_browser: bool = True) -> None:
+    """Run the local web server and direct the user to it.
+    """
+    import threading
+    import webbrowser
+    from time import sleep
+
+    from gsheets_plaid.web_server.main import run_web_server
+
+    t = threading.Thread(target=run_web_server, kwargs={'ssl_context': 'adhoc'})
+    t.start()
+    if open_browser:
+        sleep(1)  # Wait for the server to start
+        webbrowser.open('https://localhost:8080/', new=1, autoraise=True)
+    t.join()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='gsheets_plaid',
+        description='Sync bank transaction data to Google Sheets with Plaid.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the local web server (default).')
+    serve_parser.add_argument('--no-browser', action='store_true', help="Don't open a browser tab.")
+
+    sync_parser = subparsers.add_parser('sync', help='Sync transactions without starting the web server.')
+    sync_parser.add_argument('--config', help='Path to a JSON file with Plaid and Google credentials.')
+    sync_parser.add_argument('--days', type=int, help='Number of days of transactions to sync.')
+    sync_parser.add_argument('--differential', action='store_true',
+        help='Only read the dedup columns and write the changed rows instead of the whole sheet.')
+    sync_parser.add_argument('--run-id', help='Resume the failed sync with this run id.')
+
+    replay_parser = subparsers.add_parser('replay',
+        help='Rebuild the sheet from the archived Plaid responses without calling Plaid.')
+    replay_parser.add_argument('--config', help='Path to a JSON file with Google credentials.')
+    replay_parser.add_argument('--archive-dir', help="Archive directory (defaults to the config's archive_dir).")
+
+    args = parser.parse_args(argv)
+    if args.command == 'sync':
+        run_sync(load_sync_config(args.config), args.days, args.differential, args.run_id)
+    elif args.command == 'replay':
+        run_replay(load_sync_config(args.config, REQUIRED_REPLAY_CONFIG_KEYS), args.archive_dir)
+    else:
+        run_web_server(open_browser=not getattr(args, 'no_browser', False))
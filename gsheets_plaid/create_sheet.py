@@ -1,8 +1,11 @@
-import googleapiclient.discovery
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import googleapiclient.discovery
 
 
 def create_new_spreadsheet(
-        gsheets_service: googleapiclient.discovery.Resource,
+        gsheets_service: 'googleapiclient.discovery.Resource',
         title: str = 'Finance Tracker') -> str:
     spreadsheet = {'properties': {'title': title}}
     result = gsheets_service.spreadsheets().create(body=spreadsheet).execute()
@@ -0,0 +1,205 @@
+"""Lightweight, pandas-free transaction pipeline.
+
+For small syncs (a daily sync returns a few dozen transactions per item) the
+cost of building, concatenating and sorting DataFrames dominates the run.
+The functions here mirror the normalization and merge steps in
+gsheets_plaid.sync using plain lists and produce exactly the same sheet rows.
+"""
+from datetime import datetime
+from typing import Any, Iterable
+
+TRANSACTION_COLS = [
+    'transaction_id',
+    'pending_transaction_id',
+    'pending',
+    'account_id',
+    'date',
+    'datetime',
+    'name',
+    'merchant_name',
+    'amount',
+    'iso_currency_code',
+    'unofficial_currency_code',
+    'payment_channel',
+    'category_id',
+    'category',
+    'personal_finance_category',
+    'location',
+]
+ACCOUNT_COLS = [
+    'account_id',
+    'balances',
+    'name',
+    'type',
+    'subtype',
+]
+ITEM_COLS = [
+    'item_id',
+    'institution_id',
+    'consent_expiration_time',
+]
+EXPANDED_COLS = ['category', 'personal_finance_category', 'location']
+PERSONAL_FINANCE_CATEGORY_COLS = {
+    'primary': 'personal_finance_category_primary',
+    'detailed': 'personal_finance_category_detailed',
+}
+ITEM_INFO_COLS = ['account_name', 'item_id', 'institution_id', 'institution_name']
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class TransactionTable:
+    """Transactions stored as a header and a list of rows.
+
+    Exposes ``columns`` and ``len()`` like the DataFrame it stands in for, so
+    it can be passed to fill_gsheet and apply_gsheet_formatting. Missing cells
+    are None until the table is written.
+    """
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns: list[str], rows: list[list[Any]]) -> None:
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def reindex(self, columns: list[str]) -> 'TransactionTable':
+        """Reorder the rows to match ``columns``, filling new columns with None.
+        """
+        if columns == self.columns:
+            return self
+        positions = {column: idx for idx, column in enumerate(self.columns)}
+        indexer = [positions.get(column) for column in columns]
+        rows = [[None if idx is None else row[idx] for idx in indexer] for row in self.rows]
+        return TransactionTable(list(columns), rows)
+
+    def to_values(self) -> list[list[Any]]:
+        """Header and rows as sheet values, with missing cells left blank.
+        """
+        values = [list(self.columns)]
+        values.extend([['' if cell is None else cell for cell in row] for row in self.rows])
+        return values
+
+
+def expanded_keys(cells: Iterable[dict | None]) -> list[str]:
+    """Union of the keys of the dict cells, in order of first appearance.
+    """
+    keys = {}
+    for cell in cells:
+        if cell:
+            keys.update(dict.fromkeys(cell))
+    return list(keys)
+
+
+def normalize_transaction_records(response: dict, institution: dict) -> TransactionTable:
+    """Flatten a Plaid transactions_get response into sheet rows.
+
+    Produces the same columns, in the same order, as
+    gsheets_plaid.sync.normalize_transactions.
+    """
+    transactions = response.get('transactions') or []
+    account_names = {account['account_id']: account.get('name') for account in response.get('accounts') or []}
+    item = response.get('item') or {}
+    item_info = [item.get('item_id'), item.get('institution_id'), institution.get('name')]
+
+    num_categories = max((len(t.get('category') or []) for t in transactions), default=0)
+    category_cols = [f'category{i + 1}' for i in range(num_categories)]
+    personal_finance_category_keys = expanded_keys(t.get('personal_finance_category') for t in transactions)
+    location_keys = expanded_keys(t.get('location') for t in transactions)
+
+    base_cols = [col for col in TRANSACTION_COLS if col not in EXPANDED_COLS]
+    account_name_idx = TRANSACTION_COLS.index('account_id') + 1
+    columns = (
+        base_cols[:account_name_idx]
+        + ITEM_INFO_COLS
+        + base_cols[account_name_idx:]
+        + category_cols
+        + [PERSONAL_FINANCE_CATEGORY_COLS.get(key, key) for key in personal_finance_category_keys]
+        + location_keys)
+
+    date_idx = base_cols.index('date')
+    datetime_idx = base_cols.index('datetime')
+    rows = []
+    for transaction in transactions:
+        row = [transaction.get(col) for col in base_cols]
+        if row[datetime_idx] is None:
+            row[datetime_idx] = datetime.combine(row[date_idx], datetime.min.time())
+        row[datetime_idx] = row[datetime_idx].strftime(DATETIME_FORMAT)
+        row[date_idx] = str(row[date_idx])
+        categories = transaction.get('category') or []
+        personal_finance_category = transaction.get('personal_finance_category') or {}
+        location = transaction.get('location') or {}
+        rows.append(
+            row[:account_name_idx]
+            + [account_names.get(row[account_name_idx - 1])]
+            + item_info
+            + row[account_name_idx:]
+            + [categories[i] if i < len(categories) else '' for i in range(num_categories)]
+            + [personal_finance_category.get(key) for key in personal_finance_category_keys]
+            + [location.get(key) for key in location_keys])
+    return TransactionTable(columns, rows)
+
+
+def transaction_table_from_values(values: list[list[str]]) -> TransactionTable:
+    """Build a table from the values read from the sheet (header row first).
+    """
+    if not len(values):
+        return TransactionTable([], [])
+    columns = list(values[0])
+    width = len(columns)
+    rows = [row + [None] * (width - len(row)) for row in values[1:]]
+    if 'pending' in columns:
+        pending_idx = columns.index('pending')
+        for row in rows:
+            cell = row[pending_idx]
+            row[pending_idx] = '' if cell is None else cell.lower() == 'true'
+    return TransactionTable(columns, rows)
+
+
+def merge_transaction_records(existing: TransactionTable, new: TransactionTable) -> TransactionTable:
+    """Merge new transactions with existing transactions.
+
+    Same semantics as gsheets_plaid.sync.merge_transactions.
+    """
+    num_preexisting_rows = len(existing)
+    if not num_preexisting_rows:
+        return new
+
+    # Line both tables up on the union of their columns
+    existing_cols = set(existing.columns)
+    columns = existing.columns + [col for col in new.columns if col not in existing_cols]
+    existing = existing.reindex(columns)
+    new = new.reindex(columns)
+    transaction_id_idx = columns.index('transaction_id')
+    pending_idx = columns.index('pending')
+    item_id_idx = columns.index('item_id')
+
+    # Drop blank rows left over from an earlier merge, and pending transactions
+    # that share the same item_id as new transactions
+    new_item_ids = {row[item_id_idx] for row in new.rows}
+    existing_rows = [
+        row for row in existing.rows
+        if row[transaction_id_idx] not in (None, '')
+        and not (row[item_id_idx] in new_item_ids and row[pending_idx] is True)]
+
+    # Drop new transactions that are already found in existing transactions
+    existing_transaction_ids = {row[transaction_id_idx] for row in existing_rows}
+    new_rows = [row for row in new.rows if row[transaction_id_idx] not in existing_transaction_ids]
+
+    # Sort by pending and datetime (descending), then name (ascending). Both
+    # passes are stable, and missing values sort last like they do in pandas.
+    datetime_idx = columns.index('datetime')
+    name_idx = columns.index('name')
+    rows = existing_rows + new_rows
+    rows.sort(key=lambda row: (row[name_idx] is None, row[name_idx] or ''))
+    rows.sort(
+        key=lambda row: (row[pending_idx] is True, row[datetime_idx] is not None, row[datetime_idx] or ''),
+        reverse=True)
+
+    # Add (num_preexisting_rows - num_result_rows) blank rows to the result
+    num_blank_rows = num_preexisting_rows - len(rows)
+    if num_blank_rows > 0:
+        rows.extend([[None] * len(columns) for _ in range(num_blank_rows)])
+
+    rows = [['' if cell is None else cell for cell in row] for row in rows]
+    return TransactionTable(columns, rows)
@@ -0,0 +1,258 @@
+"""User-defined categorization rules, applied to transactions as they are
+normalized.
+
+Rules are checked in order and the first rule that matches a transaction
+sets its custom_category. Instead of testing every rule against every row,
+each distinct value of a field is matched against all the rules at once,
+so the cost grows with the number of distinct names rather than
+rows × rules.
+"""
+import re
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from gsheets_plaid.records import TransactionTable
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+RULE_TEXT_FIELDS = ['name', 'merchant_name', 'account_name']
+RULE_AMOUNT_FIELDS = ['min_amount', 'max_amount']
+CUSTOM_CATEGORY_COL = 'custom_category'
+LITERAL_KEY_LENGTH = 3
+LITERAL_PATTERN = re.compile(r'(\^?)((?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])+)(\$?)')
+
+
+class CategoryRule:
+    """Assigns ``category`` to transactions that match every condition given.
+
+    Text conditions are case-insensitive regular expressions that may match
+    anywhere in the field. The amount range is inclusive and uses Plaid's
+    sign convention (money leaving the account is positive). A rule with no
+    conditions matches every transaction, which is useful as a last rule.
+    """
+    __slots__ = ('category', 'patterns', 'min_amount', 'max_amount')
+
+    def __init__(
+            self,
+            category: str,
+            name: str | None = None,
+            merchant_name: str | None = None,
+            account_name: str | None = None,
+            min_amount: float | None = None,
+            max_amount: float | None = None) -> None:
+        self.category = category
+        self.patterns = {}
+        for field, pattern in zip(RULE_TEXT_FIELDS, (name, merchant_name, account_name)):
+            if pattern:
+                self.patterns[field] = re.compile(pattern, re.IGNORECASE)
+        self.min_amount = -np.inf if min_amount is None else float(min_amount)
+        self.max_amount = np.inf if max_amount is None else float(max_amount)
+
+    @property
+    def has_amount_range(self) -> bool:
+        return self.min_amount != -np.inf or self.max_amount != np.inf
+
+    def matches(self, texts: dict[str, str], amount: float) -> bool:
+        if self.has_amount_range and not self.min_amount <= amount <= self.max_amount:
+            return False
+        return all(pattern.search(texts[field]) for field, pattern in self.patterns.items())
+
+
+def build_rules(config: list[dict]) -> list[CategoryRule]:
+    """Build rules from config entries like
+    ``{"category": "Groceries", "merchant_name": "whole foods|trader joe"}``.
+    """
+    rules = []
+    for idx, entry in enumerate(config):
+        options = dict(entry)
+        unknown_keys = set(options) - {'category', *RULE_TEXT_FIELDS, *RULE_AMOUNT_FIELDS}
+        if 'category' not in options or unknown_keys:
+            raise ValueError(
+                f'Rule {idx + 1} must have a category and only the conditions '
+                f'{RULE_TEXT_FIELDS + RULE_AMOUNT_FIELDS}, got {sorted(options)}.')
+        try:
+            rules.append(CategoryRule(**options))
+        except re.error as e:
+            raise ValueError(f'Rule {idx + 1} has an invalid pattern: {e}')
+    return rules
+
+
+class RuleSet:
+    """Rules compiled for matching whole columns at once.
+
+    Most rules are plain words or ``word|other word`` alternatives, like the
+    REGEXMATCH formulas they replace. For each text field, the literals in
+    those patterns are indexed by their first few characters, so a value is
+    scanned once and only the literals starting at each position are
+    compared. Patterns that aren't literal (eg. ``grocer(y|ies)``) are
+    searched one by one.
+
+    The index only holds ASCII literals and is only used for ASCII values.
+    Case-insensitive regex matching folds some other characters differently
+    from str.lower() (eg. 'İ' or 'ſ'), so non-ASCII values are searched with
+    every pattern for the field instead.
+    """
+    def __init__(self, rules: list[CategoryRule]) -> None:
+        self.rules = rules
+        self.no_match = len(rules)
+        self.categories = np.array([rule.category for rule in rules] + [None], dtype=object)
+
+        # Rules decided by a single text condition need no further checks
+        self.single_condition = {}
+        self.field_rules = {}
+        self.literals = {}
+        self.key_lengths = {}
+        self.separate = {}
+        for field in RULE_TEXT_FIELDS:
+            indices = [idx for idx, rule in enumerate(rules) if field in rule.patterns]
+            if not indices:
+                continue
+            self.field_rules[field] = indices
+            self.single_condition[field] = np.array(
+                [len(rule.patterns) == 1 and not rule.has_amount_range and field in rule.patterns for rule in rules]
+                + [False])
+            self.literals[field] = {}
+            self.separate[field] = []
+            for idx in indices:
+                alternatives = literal_alternatives(rules[idx].patterns[field].pattern)
+                if alternatives is None:
+                    self.separate[field].append(idx)
+                    continue
+                for literal, at_start, at_end in alternatives:
+                    key = literal[:LITERAL_KEY_LENGTH]
+                    self.literals[field].setdefault(key, []).append((idx, literal, at_start, at_end))
+            self.key_lengths[field] = sorted({len(key) for key in self.literals[field]})
+
+        # Rules with several text conditions are looked up by the first of
+        # their fields, since names and merchants narrow down the rules more
+        # than account names
+        self.primary_fields = [next(iter(rule.patterns), None) for rule in rules]
+
+        # Rules without text conditions are matched on the amount alone
+        self.amount_only = [idx for idx, rule in enumerate(rules) if not rule.patterns]
+
+    def matching_rules(self, field: str, value: str) -> list[int]:
+        """Indices of all the rules whose pattern for ``field`` is found in
+        ``value``, in order.
+        """
+        if not value.isascii():
+            return [idx for idx in self.field_rules[field] if self.rules[idx].patterns[field].search(value)]
+        matches = set()
+        literals = self.literals[field]
+        key_lengths = self.key_lengths[field]
+        value = value.lower()
+        for position in range(len(value)):
+            for key_length in key_lengths:
+                for idx, literal, at_start, at_end in literals.get(value[position:position + key_length], ()):
+                    if ((not at_start or position == 0)
+                            and value.startswith(literal, position)
+                            and (not at_end or position + len(literal) == len(value))):
+                        matches.add(idx)
+        for idx in self.separate[field]:
+            if self.rules[idx].patterns[field].search(value):
+                matches.add(idx)
+        return sorted(matches)
+
+    def categorize(self, texts: dict[str, list[str]], amounts: np.ndarray) -> np.ndarray:
+        """Custom categories for the rows given by the text columns in
+        ``texts`` and the float array ``amounts``. Rows that no rule matches
+        get None.
+        """
+        matched = np.full(len(amounts), self.no_match)
+        field_matches = {}
+        undecided = {}
+        for field in self.literals:
+            column = texts[field]
+            single_condition = self.single_condition[field]
+            field_matches[field] = {value: self.matching_rules(field, value) for value in set(column)}
+
+            # The first matching rule with no other conditions decides the row
+            # unless an earlier rule with more conditions also matches
+            first_decided = {}
+            undecided[field] = {}
+            for value, matches in field_matches[field].items():
+                first_decided[value] = next((idx for idx in matches if single_condition[idx]), self.no_match)
+                undecided[field][value] = [
+                    idx for idx in matches if not single_condition[idx] and self.primary_fields[idx] == field]
+            matched = np.minimum(matched, np.array([first_decided[value] for value in column], dtype=np.int64))
+
+        for idx in reversed(self.amount_only):
+            rule = self.rules[idx]
+            in_range = (amounts >= rule.min_amount) & (amounts <= rule.max_amount) | (not rule.has_amount_range)
+            matched = np.where(in_range & (idx < matched), idx, matched)
+
+        # Check the rules with several conditions against the rest of the row.
+        # Candidates come from each rule's primary field, and the other text
+        # conditions are looked up in the matches already found.
+        first_undecided = np.full(len(amounts), self.no_match)
+        for field, candidates in undecided.items():
+            first_candidates = {value: idxs[0] if idxs else self.no_match for value, idxs in candidates.items()}
+            first_undecided = np.minimum(
+                first_undecided, np.array([first_candidates[value] for value in texts[field]], dtype=np.int64))
+        for row in np.nonzero(first_undecided < matched)[0]:
+            row_matches = {field: matches[texts[field][row]] for field, matches in field_matches.items()}
+            candidates = sorted(
+                idx for field, field_candidates in undecided.items()
+                for idx in field_candidates[texts[field][row]] if idx < matched[row])
+            for idx in candidates:
+                rule = self.rules[idx]
+                if rule.has_amount_range and not rule.min_amount <= amounts[row] <= rule.max_amount:
+                    continue
+                if all(idx in row_matches[field] for field in rule.patterns):
+                    matched[row] = idx
+                    break
+
+        return self.categories[matched]
+
+    def apply(self, transactions: 'pd.DataFrame | TransactionTable') -> 'pd.DataFrame | TransactionTable':
+        """Add the custom_category column to normalized transactions.
+        """
+        if isinstance(transactions, TransactionTable):
+            columns = transactions.columns
+            texts = {}
+            for field in RULE_TEXT_FIELDS:
+                field_idx = columns.index(field)
+                texts[field] = [text_value(row[field_idx]) for row in transactions.rows]
+            amount_idx = columns.index('amount')
+            amounts = np.array([amount_value(row[amount_idx]) for row in transactions.rows], dtype=float)
+            categories = self.categorize(texts, amounts)
+            if CUSTOM_CATEGORY_COL in columns:
+                transactions = transactions.reindex([col for col in columns if col != CUSTOM_CATEGORY_COL])
+            rows = [row + [category] for row, category in zip(transactions.rows, categories)]
+            return TransactionTable(transactions.columns + [CUSTOM_CATEGORY_COL], rows)
+
+        texts = {field: [text_value(value) for value in transactions[field]] for field in RULE_TEXT_FIELDS}
+        amounts = np.array([amount_value(value) for value in transactions['amount']], dtype=float)
+        transactions = transactions.drop(columns=CUSTOM_CATEGORY_COL, errors='ignore')
+        transactions[CUSTOM_CATEGORY_COL] = self.categorize(texts, amounts)
+        return transactions
+
+
+def text_value(cell: Any) -> str:
+    return cell if isinstance(cell, str) else ''
+
+
+def amount_value(cell: Any) -> float:
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def literal_alternatives(pattern: str) -> list[tuple[str, bool, bool]] | None:
+    """Split a pattern like ``^foo|bar baz`` into lowercase literals, each
+    with whether it is anchored to the start and end of the value. Returns
+    None if the pattern uses any other regex syntax or isn't ASCII.
+    """
+    if not pattern.isascii():
+        return None
+    alternatives = []
+    for alternative in pattern.split('|'):
+        match = LITERAL_PATTERN.fullmatch(alternative)
+        if match is None:
+            return None
+        literal = re.sub(r'\\(.)', r'\1', match.group(2)).lower()
+        alternatives.append((literal, bool(match.group(1)), bool(match.group(3))))
+    return alternatives
@@ -1,10 +1,13 @@
+import asyncio
 import json
 import os
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
-import googleapiclient.discovery
-import plaid
 from google.oauth2.credentials import Credentials
-from plaid.api import plaid_api
+
+if TYPE_CHECKING:
+    import googleapiclient.discovery
+    from plaid.api import plaid_api
 
 GOOGLE_SCOPES = [
     'https://www.googleapis.com/auth/drive.file',
@@ -12,12 +15,19 @@ GOOGLE_SCOPES = [
     'https://www.googleapis.com/auth/userinfo.profile',
     'https://www.googleapis.com/auth/userinfo.email',
 ]
+# Upper bound on the Plaid calls one request or sync makes at once
+PLAID_MAX_CONCURRENT_REQUESTS = int(os.environ.get('GSHEETS_PLAID_MAX_CONCURRENT_REQUESTS', 8))
 
 
 def generate_plaid_client(
         plaid_env: str,
         plaid_client_id: str,
-        plaid_secret: str) -> plaid_api.PlaidApi:
+        plaid_secret: str) -> 'plaid_api.PlaidApi':
+    # plaid_api is one of the slowest modules to import, so only load it once
+    # a client is actually needed.
+    import plaid
+    from plaid.api import plaid_api
+
     if plaid_env == 'sandbox':
         host = plaid.Environment.Sandbox
     elif plaid_env == 'development':
@@ -41,7 +51,31 @@ def generate_plaid_client(
     return plaid_client
 
 
-def generate_gsheets_service(credentials: Credentials | dict | str) -> googleapiclient.discovery.Resource:
+class AsyncPlaidClient:
+    """Awaitable wrapper around a plaid_api.PlaidApi client.
+
+    Every method of the wrapped client becomes a coroutine that makes the
+    call in a worker thread, so that independent calls (eg. one per item)
+    can be in flight at the same time with asyncio.gather. The Plaid client's
+    connection pool is thread-safe. At most ``max_concurrent_requests`` calls
+    run at once.
+    """
+    def __init__(self, plaid_client: 'plaid_api.PlaidApi', max_concurrent_requests: int | None = None) -> None:
+        self.plaid_client = plaid_client
+        self.semaphore = asyncio.Semaphore(max_concurrent_requests or PLAID_MAX_CONCURRENT_REQUESTS)
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        method = getattr(self.plaid_client, name)
+
+        async def call(*args, **kwargs) -> Any:
+            async with self.semaphore:
+                return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+def generate_gsheets_service(credentials: Credentials | dict | str) -> 'googleapiclient.discovery.Resource':
+    import googleapiclient.discovery
+
     if isinstance(credentials, dict):
         credentials = Credentials.from_authorized_user_info(credentials, GOOGLE_SCOPES)
     elif isinstance(credentials, str) and os.path.isfile(credentials):
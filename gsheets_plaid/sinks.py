@@ -0,0 +1,286 @@
+"""Output sinks that receive the merged transactions alongside Google Sheets.
+
+Sinks are fed the same rows that are written to the sheet, in chunks, so
+the transactions are normalized once however many sinks there are.
+"""
+import csv
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Iterator
+
+from gsheets_plaid.atomic import AtomicFile
+from gsheets_plaid.records import TransactionTable
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SINK_CHUNK_SIZE = 5000
+
+
+def coerce_bool(cell: Any) -> bool | None:
+    if cell in ('', None):
+        return None
+    if isinstance(cell, str):
+        return cell.lower() == 'true'
+    return bool(cell)
+
+
+def coerce_float(cell: Any) -> float | None:
+    if cell in ('', None):
+        return None
+    try:
+        return float(str(cell).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def coerce_str(cell: Any) -> str | None:
+    if cell in ('', None):
+        return None
+    return str(cell)
+
+
+# Cells read back from the sheet are strings, so typed sinks convert every
+# value. Columns not listed here are stored as text.
+COLUMN_COERCIONS = {
+    'pending': coerce_bool,
+    'amount': coerce_float,
+}
+
+
+class TransactionSink(ABC):
+    """Destination for transactions, written in chunks of rows.
+
+    ``open`` is called once with the column names, then ``write`` once per
+    chunk, then ``close``. If anything fails along the way, ``abort`` is
+    called instead of ``close`` and must leave the destination as it was
+    (it may be called on a sink that was never opened). Writing the same
+    transactions again must be safe, so that a resumed sync can replay it.
+    """
+    def open(self, columns: list[str]) -> None:
+        self.columns = columns
+
+    @abstractmethod
+    def write(self, rows: list[list[Any]]) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+class CSVSink(TransactionSink):
+    """Writes the transactions to a CSV file, replacing its contents. The
+    file is only replaced once every row is written.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = None
+
+    def open(self, columns: list[str]) -> None:
+        super().open(columns)
+        self.file = AtomicFile(self.path, 'w', newline='')
+        self.writer = csv.writer(self.file.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows: list[list[Any]]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        if self.file is not None:
+            file, self.file = self.file, None
+            file.commit()
+
+    def abort(self) -> None:
+        if self.file is not None:
+            file, self.file = self.file, None
+            file.discard()
+
+
+class ParquetSink(TransactionSink):
+    """Writes the transactions to a Parquet file, one row group per chunk.
+    The file is only replaced once every row is written.
+
+    Requires pyarrow (``pip install gsheets-plaid[parquet]``).
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.writer = None
+
+    def open(self, columns: list[str]) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('ParquetSink requires pyarrow: pip install gsheets-plaid[parquet]')
+        super().open(columns)
+        self.pa = pa
+        types = {'pending': pa.bool_(), 'amount': pa.float64()}
+        self.schema = pa.schema([(name, types.get(name, pa.string())) for name in columns])
+        self.file = AtomicFile(self.path)
+        try:
+            self.writer = pq.ParquetWriter(self.file.file, self.schema)
+        except BaseException:
+            self.file.discard()
+            raise
+
+    def write(self, rows: list[list[Any]]) -> None:
+        arrays = []
+        for idx, name in enumerate(self.columns):
+            coerce = COLUMN_COERCIONS.get(name, coerce_str)
+            arrays.append(self.pa.array([coerce(row[idx]) for row in rows], type=self.schema.field(name).type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        if self.writer is not None:
+            writer, self.writer = self.writer, None
+            try:
+                writer.close()
+            except BaseException:
+                self.file.discard()
+                raise
+            self.file.commit()
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            writer, self.writer = self.writer, None
+            writer.close()
+            self.file.discard()
+
+
+class SQLiteSink(TransactionSink):
+    """Upserts the transactions into a SQLite table keyed on transaction_id.
+
+    Pending transactions that were not part of the write (because they have
+    since posted under a new transaction_id) are deleted on close, so the
+    table matches the sheet. All the changes are made in one transaction,
+    which is rolled back if the write is aborted.
+    """
+    def __init__(self, path: str, table: str = 'transactions') -> None:
+        self.path = path
+        self.table = table
+        self.conn = None
+
+    def open(self, columns: list[str]) -> None:
+        super().open(columns)
+        self.conn = sqlite3.connect(self.path)
+        column_types = {'transaction_id': 'TEXT PRIMARY KEY', 'pending': 'INTEGER', 'amount': 'REAL'}
+        definitions = ', '.join(f'{quote(name)} {column_types.get(name, "TEXT")}' for name in columns)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS {quote(self.table)} ({definitions})')
+
+        # Columns can be added to the sheet over time (eg. new location fields)
+        existing_columns = {row[1] for row in self.conn.execute(f'PRAGMA table_info({quote(self.table)})')}
+        for name in columns:
+            if name not in existing_columns:
+                self.conn.execute(
+                    f'ALTER TABLE {quote(self.table)} ADD COLUMN {quote(name)} {column_types.get(name, "TEXT")}')
+
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS written (transaction_id TEXT PRIMARY KEY)')
+        self.conn.execute('DELETE FROM temp.written')
+        updates = ', '.join(f'{quote(name)} = excluded.{quote(name)}' for name in columns if name != 'transaction_id')
+        self.upsert = (
+            f'INSERT INTO {quote(self.table)} ({", ".join(map(quote, columns))}) '
+            f'VALUES ({", ".join("?" * len(columns))}) '
+            f'ON CONFLICT (transaction_id) DO UPDATE SET {updates}')
+        self.coercions = [COLUMN_COERCIONS.get(name, coerce_str) for name in columns]
+
+    def write(self, rows: list[list[Any]]) -> None:
+        rows = [[coerce(cell) for coerce, cell in zip(self.coercions, row)] for row in rows]
+        transaction_id_idx = self.columns.index('transaction_id')
+        # Committed by close()
+        self.conn.executemany(self.upsert, rows)
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO temp.written VALUES (?)',
+            [(row[transaction_id_idx],) for row in rows])
+
+    def close(self) -> None:
+        if self.conn is None:
+            return
+        with self.conn:
+            self.conn.execute(
+                f'DELETE FROM {quote(self.table)} WHERE pending = 1 '
+                'AND transaction_id NOT IN (SELECT transaction_id FROM temp.written)')
+        self.conn.close()
+        self.conn = None
+
+    def abort(self) -> None:
+        if self.conn is None:
+            return
+        self.conn.rollback()
+        self.conn.close()
+        self.conn = None
+
+
+def quote(identifier: str) -> str:
+    """Quote a SQLite identifier (sheet headers are used as column names).
+    """
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+SINK_TYPES = {
+    'csv': CSVSink,
+    'parquet': ParquetSink,
+    'sqlite': SQLiteSink,
+}
+
+
+def build_sinks(config: list[dict]) -> list[TransactionSink]:
+    """Build sinks from config entries like
+    ``{"type": "sqlite", "path": "transactions.db"}``. Any other keys are
+    passed to the sink's constructor.
+    """
+    sinks = []
+    for entry in config:
+        options = dict(entry)
+        sink_type = options.pop('type')
+        if sink_type not in SINK_TYPES:
+            raise ValueError(f"Unknown sink type '{sink_type}'. Expected one of {list(SINK_TYPES)}.")
+        sinks.append(SINK_TYPES[sink_type](**options))
+    return sinks
+
+
+def iter_row_chunks(
+        transactions: 'pd.DataFrame | TransactionTable',
+        chunk_size: int = SINK_CHUNK_SIZE) -> Iterator[list[list[Any]]]:
+    """Yield the rows of a DataFrame or TransactionTable in chunks, with
+    missing cells blank.
+    """
+    for start in range(0, len(transactions), chunk_size):
+        if isinstance(transactions, TransactionTable):
+            rows = transactions.rows[start:start + chunk_size]
+            yield [['' if cell is None else cell for cell in row] for row in rows]
+        else:
+            yield transactions.iloc[start:start + chunk_size].fillna('').to_numpy().tolist()
+
+
+def write_to_sinks(
+        transactions: 'pd.DataFrame | TransactionTable',
+        sinks: list[TransactionSink],
+        chunk_size: int = SINK_CHUNK_SIZE) -> None:
+    """Stream the transactions into every sink in a single pass. Blank rows
+    (used to clear the end of the sheet) are left out.
+
+    If opening or writing any sink fails, every sink is aborted, so none of
+    them is left with a partial write.
+    """
+    if not sinks:
+        return
+    columns = list(transactions.columns)
+    transaction_id_idx = columns.index('transaction_id')
+    try:
+        for sink in sinks:
+            sink.open(columns)
+        for rows in iter_row_chunks(transactions, chunk_size):
+            rows = [row for row in rows if row[transaction_id_idx] != '']
+            if not rows:
+                continue
+            for sink in sinks:
+                sink.write(rows)
+    except BaseException:
+        for sink in sinks:
+            sink.abort()
+        raise
+    for sink in sinks:
+        sink.close()
@@ -1,76 +1,115 @@
-from datetime import datetime, timedelta
+import asyncio
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import TYPE_CHECKING, Iterator
 
-import googleapiclient.discovery
 import numpy as np
 import pandas as pd
 import plaid
-from plaid.api import plaid_api
 from plaid.model.country_code import CountryCode
 from plaid.model.institutions_get_by_id_request import InstitutionsGetByIdRequest
 from plaid.model.transactions_get_request import TransactionsGetRequest
 from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
 
-TRANSACTION_COLS = [
-    'transaction_id',
-    'pending_transaction_id',
-    'pending',
-    'account_id',
-    'date',
-    'datetime',
-    'name',
-    'merchant_name',
-    'amount',
-    'iso_currency_code',
-    'unofficial_currency_code',
-    'payment_channel',
-    'category_id',
-    'category',
-    'personal_finance_category',
-    'location',
-]
-ACCOUNT_COLS = [
-    'account_id',
-    'balances',
-    'name',
-    'type',
-    'subtype',
-]
-ITEM_COLS = [
-    'item_id',
-    'institution_id',
-    'consent_expiration_time',
-]
+from gsheets_plaid.archive import TransactionArchive
+from gsheets_plaid.balances import BALANCE_COLS, BALANCE_KEY_COLS, BALANCES_SHEET, balance_rows, new_balance_rows
+from gsheets_plaid.checkpoint import SyncCheckpoint, fetch_stage
+from gsheets_plaid.records import (ACCOUNT_COLS, ITEM_COLS, TRANSACTION_COLS, TransactionTable,
+                                   merge_transaction_records, normalize_transaction_records,
+                                   transaction_table_from_values)
+from gsheets_plaid.rules import CategoryRule, RuleSet
+from gsheets_plaid.services import AsyncPlaidClient
+from gsheets_plaid.sinks import TransactionSink, write_to_sinks
 
+if TYPE_CHECKING:
+    import googleapiclient.discovery
+    from plaid.api import plaid_api
 
-def get_transactions_from_plaid(
-        plaid_client: plaid_api.PlaidApi,
-        access_token: str,
-        num_days: int = 30) -> pd.DataFrame:
-    """Get transaction data from Plaid for a given access token.
-    """
+SMALL_SYNC_MAX_ROWS = 2000
+GSHEET_CHUNK_SIZE = 5000
+GSHEET_CHUNKS_PER_REQUEST = 4
+DEDUP_COLS = ['transaction_id', 'pending', 'item_id']
+SORT_COLS = [('pending', 'DESCENDING'), ('datetime', 'DESCENDING'), ('name', 'ASCENDING')]
+
+
+def transactions_get_request(access_token: str, num_days: int = 30) -> TransactionsGetRequest:
     start_date = (datetime.now() - timedelta(days=num_days))
     end_date = datetime.now()
     options = TransactionsGetRequestOptions(include_personal_finance_category=True)
-    transaction_request = TransactionsGetRequest(
+    return TransactionsGetRequest(
         access_token=access_token,
         start_date=start_date.date(),
         end_date=end_date.date(),
         options=options
     )
-    transaction_response = plaid_client.transactions_get(transaction_request)
-    transactions = pd.DataFrame(transaction_response.to_dict().get('transactions'))[TRANSACTION_COLS]
-    accounts = pd.DataFrame(transaction_response.to_dict().get('accounts'))[ACCOUNT_COLS]
-    item = pd.Series(transaction_response.to_dict().get('item'))[ITEM_COLS]
-    institution_request = InstitutionsGetByIdRequest(
-        institution_id=item.institution_id,
+
+
+def institutions_get_request(transaction_response: dict) -> InstitutionsGetByIdRequest:
+    return InstitutionsGetByIdRequest(
+        institution_id=transaction_response.get('item').get('institution_id'),
         country_codes=list(map(lambda x: CountryCode(x), ['US']))
     )
-    institution_response = plaid_client.institutions_get_by_id(institution_request)
-    institution = pd.Series(institution_response.to_dict().get('institution'))
+
+
+def request_transactions(
+        plaid_client: 'plaid_api.PlaidApi',
+        access_token: str,
+        num_days: int = 30) -> tuple[dict, dict]:
+    """Request raw transaction data and institution info from Plaid for a
+    given access token.
+    """
+    transaction_response = plaid_client.transactions_get(transactions_get_request(access_token, num_days)).to_dict()
+    institution_response = plaid_client.institutions_get_by_id(institutions_get_request(transaction_response))
+    institution = institution_response.to_dict().get('institution')
+    return transaction_response, institution
+
+
+async def request_transactions_async(
+        plaid_client: AsyncPlaidClient,
+        access_token: str,
+        num_days: int = 30) -> tuple[dict, dict]:
+    """Same as request_transactions, with an AsyncPlaidClient.
+    """
+    transaction_response = await plaid_client.transactions_get(transactions_get_request(access_token, num_days))
+    transaction_response = transaction_response.to_dict()
+    institution_response = await plaid_client.institutions_get_by_id(institutions_get_request(transaction_response))
+    institution = institution_response.to_dict().get('institution')
+    return transaction_response, institution
+
+
+async def request_all_transactions(
+        plaid_client: 'plaid_api.PlaidApi',
+        access_tokens: list[str],
+        num_days: int = 30) -> list[tuple[dict, dict] | Exception]:
+    """Request the transactions for all the access tokens concurrently.
+    Failed requests are returned as their exception.
+    """
+    async_client = AsyncPlaidClient(plaid_client)
+    return await asyncio.gather(
+        *(request_transactions_async(async_client, token, num_days) for token in access_tokens),
+        return_exceptions=True)
+
+
+def get_transactions_from_plaid(
+        plaid_client: 'plaid_api.PlaidApi',
+        access_token: str,
+        num_days: int = 30) -> pd.DataFrame:
+    """Get transaction data from Plaid for a given access token.
+    """
+    return normalize_transactions(*request_transactions(plaid_client, access_token, num_days))
+
+
+def normalize_transactions(transaction_response: dict, institution: dict) -> pd.DataFrame:
+    """Flatten a Plaid transactions_get response into a DataFrame.
+    """
+    transactions = pd.DataFrame(transaction_response.get('transactions'))[TRANSACTION_COLS]
+    accounts = pd.DataFrame(transaction_response.get('accounts'))[ACCOUNT_COLS]
+    item = pd.Series(transaction_response.get('item'))[ITEM_COLS]
+    institution = pd.Series(institution)
 
     # Convert datetime to string
     def fillna_datetime(row: pd.Series) -> datetime:
-        if row.datetime is not None:
+        if not pd.isna(row.datetime):
             return row.datetime
         return datetime.combine(row.date, datetime.min.time())
     transactions['datetime'] = transactions.apply(fillna_datetime, axis=1)
@@ -120,27 +159,214 @@ def get_transactions_from_plaid(
 
 
 def get_transactions_from_gsheet(
-        gsheets_service: googleapiclient.discovery.Resource,
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = 'Sheet1',
+        header: list[str] | None = None,
+        row_count: int | None = None) -> pd.DataFrame:
+    """Get the transactions already saved to the Google Sheet. Each chunk of
+    rows is parsed as soon as it is read, so only one chunk of raw rows is
+    held at a time.
+    """
+    frames = list(iter_transactions_from_gsheet(
+        gsheets_service, spreadsheet_id, spreadsheet_range, header=header, row_count=row_count))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_transactions_from_gsheet(
+        gsheets_service: 'googleapiclient.discovery.Resource',
         spreadsheet_id: str,
-        spreadsheet_range: str = 'Sheet1') -> pd.DataFrame:
-    """Get the transactions already saved to the Google Sheet.
+        spreadsheet_range: str = 'Sheet1',
+        columns: list[str] | None = None,
+        chunk_size: int = GSHEET_CHUNK_SIZE,
+        header: list[str] | None = None,
+        row_count: int | None = None) -> Iterator[pd.DataFrame]:
+    """Lazily read the transactions saved to the Google Sheet, one DataFrame
+    per chunk of rows. Pass ``columns`` to only keep some of the columns (eg.
+    transaction_id, pending and item_id for deduplication).
+    """
+    if header is None:
+        header = get_gsheet_header(gsheets_service, spreadsheet_id, spreadsheet_range)
+    if not header:
+        return
+    for rows in iter_gsheet_rows(gsheets_service, spreadsheet_id, header, spreadsheet_range, chunk_size,
+                                 row_count=row_count):
+        yield transactions_frame_from_rows(header, rows, columns)
+
+
+def get_gsheet_header(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = 'Sheet1') -> list[str]:
+    """Get the header row of the Google Sheet.
     """
     result = gsheets_service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
-        range=spreadsheet_range,
+        range=a1_range(spreadsheet_range, '1:1'),
     ).execute()
-    rows = result.get('values', [])
-    if not len(rows):
-        return []
-    transactions = pd.DataFrame(rows[1:], columns=rows[0])
+    values = result.get('values', [])
+    return values[0] if values else []
+
+
+def iter_gsheet_rows(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        header: list[str],
+        spreadsheet_range: str = 'Sheet1',
+        chunk_size: int = GSHEET_CHUNK_SIZE,
+        chunks_per_request: int = GSHEET_CHUNKS_PER_REQUEST,
+        row_count: int | None = None) -> Iterator[list[list[str]]]:
+    """Yield the rows below the header in chunks of ``chunk_size`` rows.
+
+    Each batchGet request fetches ``chunks_per_request`` row ranges, up to
+    the sheet's row count (looked up unless given). The Sheets API leaves out trailing empty rows, so
+    a chunk can come back short even when more rows follow. Those blank rows
+    are added back before the next rows, which keeps every row at its
+    position below the header, and dropped at the end of the sheet.
+    """
+    last_column = column_letter(len(header) - 1)
+    if row_count is None:
+        row_count = get_sheet_row_count(gsheets_service, spreadsheet_id, spreadsheet_range)
+    start_row = 2
+    num_blank_rows = 0
+    while start_row <= row_count:
+        ranges = []
+        chunk_sizes = []
+        for _ in range(chunks_per_request):
+            if start_row > row_count:
+                break
+            end_row = min(start_row + chunk_size - 1, row_count)
+            ranges.append(a1_range(spreadsheet_range, f'A{start_row}:{last_column}{end_row}'))
+            chunk_sizes.append(end_row - start_row + 1)
+            start_row = end_row + 1
+        result = gsheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+        ).execute()
+        for value_range, size in zip(result.get('valueRanges', []), chunk_sizes):
+            rows = value_range.get('values', [])
+            if rows:
+                yield [[] for _ in range(num_blank_rows)] + rows
+                num_blank_rows = 0
+            num_blank_rows += size - len(rows)
+
+
+def read_gsheet_transactions(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        header: list[str],
+        num_new_rows: int,
+        spreadsheet_range: str = 'Sheet1') -> pd.DataFrame | TransactionTable:
+    """Read the transactions already in the sheet, to merge ``num_new_rows``
+    new rows into.
+
+    The pipeline is picked from the sheet's row count before any rows are
+    read (see small_sync). Small merges get a TransactionTable, larger ones a
+    DataFrame parsed chunk by chunk.
+    """
+    num_existing_rows = get_sheet_row_count(gsheets_service, spreadsheet_id, spreadsheet_range) - 1 if header else 0
+    if small_sync(num_existing_rows, num_new_rows):
+        rows = iter_gsheet_rows(
+            gsheets_service, spreadsheet_id, header, spreadsheet_range, row_count=num_existing_rows + 1)
+        return transaction_table_from_values([header, *chain.from_iterable(rows)] if header else [])
+    if not header:
+        return pd.DataFrame()
+    return get_transactions_from_gsheet(
+        gsheets_service, spreadsheet_id, spreadsheet_range, header=header, row_count=num_existing_rows + 1)
+
+
+def small_sync(num_existing_rows: int, num_new_rows: int) -> bool:
+    """Whether a merge is small enough (up to SMALL_SYNC_MAX_ROWS existing
+    plus new rows) for the pandas-free pipeline in gsheets_plaid.records.
+    The existing rows may include the sheet's empty rows.
+    """
+    return num_existing_rows + num_new_rows <= SMALL_SYNC_MAX_ROWS
+
+
+def transactions_frame_from_rows(
+        header: list[str],
+        rows: list[list[str]],
+        columns: list[str] | None = None) -> pd.DataFrame:
+    """Parse sheet rows straight into typed columns, optionally keeping only
+    ``columns``.
+    """
+    keep = set(header if columns is None else columns)
+    data = {}
+    for idx, name in enumerate(header):
+        if name in keep:
+            # The Sheets API drops trailing empty cells
+            data[name] = [row[idx] if idx < len(row) else None for row in rows]
 
     # Turn pending into a boolean column
-    def convert_pending(cell: str) -> bool:
-        if cell is None:
-            return ''
-        return cell.lower() == 'true'
-    transactions['pending'] = transactions.pending.apply(convert_pending)
-    return transactions
+    if 'pending' in data:
+        data['pending'] = [convert_pending(cell) for cell in data['pending']]
+    return pd.DataFrame(data, columns=list(data))
+
+
+def convert_pending(cell: str | None) -> bool | str:
+    if cell is None:
+        return ''
+    return cell.lower() == 'true'
+
+
+def get_transaction_keys_from_gsheet(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = 'Sheet1',
+        columns: list[str] = DEDUP_COLS,
+        header: list[str] | None = None) -> pd.DataFrame:
+    """Get only some columns of the transactions saved to the Google Sheet.
+
+    The header positions are resolved once and each column is fetched as its
+    own range in a single batchGet request, so wide columns (eg. location)
+    are never downloaded. The index of the result is the row's position
+    below the header.
+    """
+    if header is None:
+        header = get_gsheet_header(gsheets_service, spreadsheet_id, spreadsheet_range)
+    positions = {name: idx for idx, name in enumerate(header)}
+    missing_columns = [name for name in columns if name not in positions]
+    if missing_columns:
+        raise KeyError(f'Columns {missing_columns} not found in the Google Sheet header.')
+    ranges = [
+        a1_range(spreadsheet_range, '{0}2:{0}'.format(column_letter(positions[name])))
+        for name in columns]
+    result = gsheets_service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        majorDimension='COLUMNS',
+    ).execute()
+    data = {}
+    for name, value_range in zip(columns, result.get('valueRanges', [])):
+        values = value_range.get('values', [])
+        data[name] = values[0] if values else []
+
+    # The Sheets API drops trailing empty cells, so pad the shorter columns
+    num_rows = max(map(len, data.values()), default=0)
+    for name, cells in data.items():
+        cells.extend([None] * (num_rows - len(cells)))
+    if 'pending' in data:
+        data['pending'] = [convert_pending(cell) for cell in data['pending']]
+    return pd.DataFrame(data, columns=columns)
+
+
+def column_letter(idx: int) -> str:
+    """Convert a zero-based column index to its A1 column letter(s).
+    """
+    letters = ''
+    idx += 1
+    while idx:
+        idx, remainder = divmod(idx - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def a1_range(sheet: str, cells: str) -> str:
+    """A1 notation for ``cells`` on the named sheet.
+    """
+    return "'{}'!{}".format(sheet.replace("'", "''"), cells)
 
 
 def merge_transactions(existing_transactions: pd.DataFrame, new_transactions: pd.DataFrame) -> pd.DataFrame:
@@ -150,6 +376,9 @@ def merge_transactions(existing_transactions: pd.DataFrame, new_transactions: pd
     if not num_preexisting_rows:
         return new_transactions
 
+    # Drop blank rows left over from an earlier merge, they are added back below
+    existing_transactions = existing_transactions[existing_transactions.transaction_id.fillna('') != '']
+
     # Drop pending transactions that share the same item_id as new_transactions
     current_item = existing_transactions.item_id.isin(new_transactions.item_id.unique())
     existing_transactions = existing_transactions[~(current_item & existing_transactions.pending)]
@@ -172,23 +401,56 @@ def merge_transactions(existing_transactions: pd.DataFrame, new_transactions: pd
     # Add (num_preexisting_rows - num_result_rows) blank rows to the result
     num_blank_rows = num_preexisting_rows - len(result)
     if num_blank_rows > 0:
-        blank_rows = pd.DataFrame([[np.nan] * len(result.columns)] * num_blank_rows, columns=result.columns)
-        result = pd.concat((result, blank_rows), axis=0)
+        # Keep pending as booleans, concatenating with NaN would upcast it to float
+        blank_rows = pd.DataFrame(
+            [[np.nan] * len(result.columns)] * num_blank_rows, columns=result.columns, dtype=object)
+        result = pd.concat((result.astype({'pending': object}), blank_rows), axis=0)
     
     result.fillna('', inplace=True)
     return result
 
 
+def diff_transactions(
+        existing_keys: pd.DataFrame,
+        new_transactions: list[pd.DataFrame]) -> tuple[list[int], pd.DataFrame]:
+    """Work out how the sheet changes when new transactions are merged in,
+    using only the existing transaction_id, pending and item_id columns.
+
+    Follows the same rules as merge_transactions, applied one item at a
+    time. Returns the positions of the existing rows to delete and the new
+    rows to add.
+    """
+    existing_keys = existing_keys[existing_keys.transaction_id.fillna('') != '']
+    deleted_rows = []
+    added = []
+    for new in new_transactions:
+        # Drop pending transactions that share the same item_id as new
+        item_ids = new.item_id.unique()
+        stale = existing_keys.item_id.isin(item_ids) & (existing_keys.pending == True)
+        deleted_rows.extend(existing_keys.index[stale])
+        existing_keys = existing_keys[~stale]
+        added = [frame[~(frame.item_id.isin(item_ids) & frame.pending)] for frame in added]
+
+        # Drop new transactions that are already in the sheet
+        known_ids = pd.concat([existing_keys.transaction_id] + [frame.transaction_id for frame in added])
+        added.append(new[~new.transaction_id.isin(known_ids)])
+    added_transactions = pd.concat(added, ignore_index=True) if added else pd.DataFrame()
+    return sorted(deleted_rows), added_transactions
+
+
 def fill_gsheet(
-        gsheets_service: googleapiclient.discovery.Resource,
+        gsheets_service: 'googleapiclient.discovery.Resource',
         spreadsheet_id: str,
-        transactions: pd.DataFrame,
+        transactions: pd.DataFrame | TransactionTable,
         spreadsheet_range: str = 'Sheet1') -> None:
     """Fill transaction data into Google Sheet.
     """
-    headers = transactions.columns.tolist()
-    values = transactions.fillna('').to_numpy().tolist()
-    values.insert(0, headers)
+    if isinstance(transactions, TransactionTable):
+        values = transactions.to_values()
+    else:
+        headers = transactions.columns.tolist()
+        values = transactions.fillna('').to_numpy().tolist()
+        values.insert(0, headers)
     gsheets_service.spreadsheets().values().update(
         spreadsheetId=spreadsheet_id,
         range=spreadsheet_range,
@@ -198,17 +460,28 @@ def fill_gsheet(
 
 
 def apply_gsheet_formatting(
-        gsheets_service: googleapiclient.discovery.Resource,
+        gsheets_service: 'googleapiclient.discovery.Resource',
         spreadsheet_id: str,
-        transactions: pd.DataFrame):
+        transactions: pd.DataFrame | TransactionTable):
     """Apply some formatting to the Google Sheet (datetime format, freeze
     header, etc.).
     """
+    gsheets_service.spreadsheets().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={'requests': gsheet_formatting_requests(list(transactions.columns))},
+    ).execute()
+
+
+def gsheet_formatting_requests(columns: list[str]) -> list[dict]:
+    """batchUpdate requests for the datetime format and the bold, frozen
+    header.
+    """
+    datetime_idx = columns.index('datetime')
     datetime_format = {
         'repeatCell': {
             'range': {
-                'startColumnIndex': transactions.columns.get_loc('datetime'),
-                'endColumnIndex': transactions.columns.get_loc('datetime') + 1,
+                'startColumnIndex': datetime_idx,
+                'endColumnIndex': datetime_idx + 1,
             },
             'cell': {
                 'userEnteredFormat': {
@@ -247,20 +520,284 @@ def apply_gsheet_formatting(
             'fields': 'gridProperties.frozenRowCount',
         }
     }
-    # Send batch requests
-    requests = [
+    return [
         datetime_format,
         header_format,
         freeze_header,
     ]
+
+
+def write_gsheet_differential(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        header: list[str],
+        deleted_rows: list[int],
+        new_transactions: pd.DataFrame,
+        spreadsheet_range: str = 'Sheet1') -> None:
+    """Apply a diff to the Google Sheet instead of rewriting every row.
+
+    Deletes the rows at ``deleted_rows`` (positions below the header),
+    appends ``new_transactions`` and lets Sheets re-sort the rows by pending,
+    datetime and name. Sheets sorts names case-insensitively, unlike a full
+    rewrite.
+    """
+    sheet_id = get_sheet_id(gsheets_service, spreadsheet_id, spreadsheet_range)
+    columns = header + [col for col in new_transactions.columns if col not in header]
+    if columns != header:
+        gsheets_service.spreadsheets().values().update(
+            spreadsheetId=spreadsheet_id,
+            range=a1_range(spreadsheet_range, 'A1'),
+            valueInputOption='USER_ENTERED',
+            body={'values': [columns]},
+        ).execute()
+
+    # Delete runs of consecutive rows, bottom first so the indices stay valid
+    delete_requests = []
+    for row in sorted(deleted_rows, reverse=True):
+        start_idx = row + 1  # Skip the header
+        if delete_requests and delete_requests[-1]['deleteDimension']['range']['startIndex'] == start_idx + 1:
+            delete_requests[-1]['deleteDimension']['range']['startIndex'] = start_idx
+            continue
+        delete_requests.append({
+            'deleteDimension': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'dimension': 'ROWS',
+                    'startIndex': start_idx,
+                    'endIndex': start_idx + 1,
+                }
+            }
+        })
+    if delete_requests:
+        gsheets_service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': delete_requests},
+        ).execute()
+
+    if len(new_transactions):
+        values = new_transactions.reindex(columns=columns).fillna('').to_numpy().tolist()
+        gsheets_service.spreadsheets().values().append(
+            spreadsheetId=spreadsheet_id,
+            range=a1_range(spreadsheet_range, 'A1'),
+            valueInputOption='USER_ENTERED',
+            insertDataOption='INSERT_ROWS',
+            body={'values': values},
+        ).execute()
+
+    sort_range = {
+        'sortRange': {
+            'range': {
+                'sheetId': sheet_id,
+                'startRowIndex': 1,
+            },
+            'sortSpecs': [
+                {'dimensionIndex': columns.index(name), 'sortOrder': order}
+                for name, order in SORT_COLS
+            ],
+        }
+    }
     gsheets_service.spreadsheets().batchUpdate(
         spreadsheetId=spreadsheet_id,
-        body={'requests': requests},
+        body={'requests': [sort_range] + gsheet_formatting_requests(columns)},
     ).execute()
 
 
+def get_sheet_id(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = 'Sheet1') -> int:
+    """Get the numeric id of the named sheet (tab) in the spreadsheet.
+    """
+    for properties in get_sheet_properties(gsheets_service, spreadsheet_id):
+        if properties['title'] == spreadsheet_range:
+            return properties['sheetId']
+    raise KeyError(f"Sheet '{spreadsheet_range}' not found in the spreadsheet.")
+
+
+def get_sheet_row_count(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = 'Sheet1') -> int:
+    """Get the number of rows in the named sheet's grid, including empty
+    rows.
+    """
+    return get_sheet_grid(gsheets_service, spreadsheet_id, spreadsheet_range)['rowCount']
+
+
+def get_sheet_grid(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = 'Sheet1') -> dict:
+    """Get the grid properties (rowCount, columnCount, etc.) of the named
+    sheet.
+    """
+    for properties in get_sheet_properties(gsheets_service, spreadsheet_id):
+        if properties['title'] == spreadsheet_range:
+            return properties['gridProperties']
+    raise KeyError(f"Sheet '{spreadsheet_range}' not found in the spreadsheet.")
+
+
+def clear_gsheet_outside(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        num_rows: int,
+        num_columns: int,
+        spreadsheet_range: str = 'Sheet1') -> None:
+    """Clear the cells below the first ``num_rows`` rows and right of the
+    first ``num_columns`` columns, ie. what is left of a larger table after
+    a smaller one was written over it.
+    """
+    grid = get_sheet_grid(gsheets_service, spreadsheet_id, spreadsheet_range)
+    ranges = []
+    if grid['rowCount'] > num_rows:
+        ranges.append(a1_range(spreadsheet_range, f'{num_rows + 1}:{grid["rowCount"]}'))
+    if grid['columnCount'] > num_columns:
+        last_column = column_letter(grid['columnCount'] - 1)
+        ranges.append(a1_range(spreadsheet_range, f'{column_letter(num_columns)}1:{last_column}{num_rows}'))
+    if ranges:
+        gsheets_service.spreadsheets().values().batchClear(
+            spreadsheetId=spreadsheet_id,
+            body={'ranges': ranges},
+        ).execute()
+
+
+def get_sheet_properties(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str) -> list[dict]:
+    """Get the properties (title, sheetId, etc.) of every sheet in the
+    spreadsheet.
+    """
+    response = gsheets_service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties',
+    ).execute()
+    return [sheet['properties'] for sheet in response.get('sheets', [])]
+
+
+def add_balances_sheet(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        sheet_id: int,
+        spreadsheet_range: str = BALANCES_SHEET) -> None:
+    """Add the balances sheet with a bold, frozen header and a date format
+    for the date column.
+    """
+    date_idx = BALANCE_COLS.index('date')
+    add_sheet = {
+        'addSheet': {
+            'properties': {
+                'sheetId': sheet_id,
+                'title': spreadsheet_range,
+                'gridProperties': {
+                    'frozenRowCount': 1,
+                },
+            }
+        }
+    }
+    date_format = {
+        'repeatCell': {
+            'range': {
+                'sheetId': sheet_id,
+                'startColumnIndex': date_idx,
+                'endColumnIndex': date_idx + 1,
+            },
+            'cell': {
+                'userEnteredFormat': {
+                    'numberFormat': {
+                        'type': 'DATE',
+                        'pattern': 'yyyy-mm-dd'
+                    }
+                }
+            },
+            'fields': 'userEnteredFormat.numberFormat',
+        }
+    }
+    header_format = {
+        'repeatCell': {
+            'range': {
+                'sheetId': sheet_id,
+                'startRowIndex': 0,
+                'endRowIndex': 1,
+            },
+            'cell': {
+                'userEnteredFormat': {
+                    'textFormat': {
+                        'bold': True,
+                    }
+                }
+            },
+            'fields': 'userEnteredFormat.textFormat',
+        }
+    }
+    gsheets_service.spreadsheets().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={'requests': [add_sheet, date_format, header_format]},
+    ).execute()
+
+
+def get_balance_keys_from_gsheet(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        spreadsheet_range: str = BALANCES_SHEET) -> set[tuple[str, str]]:
+    """Get the (date, account_id) of the snapshots already in the balances
+    sheet. Only those two columns are read.
+    """
+    ranges = [
+        a1_range(spreadsheet_range, '{0}2:{0}'.format(column_letter(BALANCE_COLS.index(name))))
+        for name in BALANCE_KEY_COLS]
+    result = gsheets_service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        majorDimension='COLUMNS',
+    ).execute()
+    columns = []
+    for value_range in result.get('valueRanges', []):
+        values = value_range.get('values', [])
+        columns.append(values[0] if values else [])
+    return set(zip(*columns))
+
+
+def append_balance_snapshots(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        snapshots: list[tuple[dict, dict, date]],
+        spreadsheet_range: str = BALANCES_SHEET) -> int:
+    """Append a balance row per account and day to the balances sheet, from
+    (transactions_get response, institution, snapshot date) tuples. The
+    sheet is added if it doesn't exist yet.
+
+    Accounts that already have a row for that day are skipped, so syncing
+    again (or resuming a sync) doesn't add duplicates. The new rows are
+    written with a single append. Returns the number of rows added.
+    """
+    rows = list(chain.from_iterable(
+        balance_rows(response, institution, snapshot_date) for response, institution, snapshot_date in snapshots))
+    sheets = get_sheet_properties(gsheets_service, spreadsheet_id)
+    sheet_exists = any(properties['title'] == spreadsheet_range for properties in sheets)
+    existing_keys = set()
+    if sheet_exists:
+        existing_keys = get_balance_keys_from_gsheet(gsheets_service, spreadsheet_id, spreadsheet_range)
+    rows = new_balance_rows(rows, existing_keys)
+    if not rows:
+        return 0
+
+    values = rows
+    if not sheet_exists:
+        sheet_id = max((properties['sheetId'] for properties in sheets), default=0) + 1
+        add_balances_sheet(gsheets_service, spreadsheet_id, sheet_id, spreadsheet_range)
+        values = [BALANCE_COLS] + rows
+    gsheets_service.spreadsheets().values().append(
+        spreadsheetId=spreadsheet_id,
+        range=a1_range(spreadsheet_range, 'A1'),
+        valueInputOption='USER_ENTERED',
+        insertDataOption='INSERT_ROWS',
+        body={'values': values},
+    ).execute()
+    return len(rows)
+
+
 def get_spreadsheet_url(
-        gsheets_service: googleapiclient.discovery.Resource,
+        gsheets_service: 'googleapiclient.discovery.Resource',
         spreadsheet_id: str) -> str:
     """Get the URL of the Google Sheet.
     """
@@ -268,21 +805,226 @@ def get_spreadsheet_url(
     return response.get('spreadsheetUrl')
 
 
-def sync_transactions(
-        gsheets_service: googleapiclient.discovery.Resource,
-        plaid_client: plaid_api.PlaidApi,
+def fetch_transactions(
+        plaid_client: 'plaid_api.PlaidApi',
         access_tokens: list[str],
-        spreadsheet_id: str,
-        num_days: int = 30) -> None:
-    """Put transaction data into Google Sheet.
+        num_days: int = 30,
+        checkpoint: SyncCheckpoint | None = None,
+        archive: TransactionArchive | None = None) -> list[tuple[dict, dict]]:
+    """Request the raw transactions for each access token, skipping tokens
+    that fail. Items without transactions in the window are kept, since
+    their accounts still have balances.
+
+    The items are requested concurrently with asyncio.run, so this is for
+    synchronous callers only and raises RuntimeError when called from a
+    running event loop (eg. an async view). Async code should await
+    request_all_transactions instead. With a checkpoint,
+    responses saved by an earlier attempt of the same run are reused and new
+    responses are saved. With an archive, every new response is also added
+    to the archive.
     """
-    transactions = get_transactions_from_gsheet(gsheets_service, spreadsheet_id)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError(
+            'fetch_transactions cannot be called from a running event loop, await request_all_transactions instead.')
+    stages = {token: fetch_stage(token) for token in access_tokens}
+    tokens_to_request = [token for token in access_tokens if checkpoint is None or not checkpoint.has(stages[token])]
+    requested = dict(zip(tokens_to_request, asyncio.run(
+        request_all_transactions(plaid_client, tokens_to_request, num_days))))
+
+    responses = []
+    error = None
     for token in access_tokens:
-        try:
-            new_transactions = get_transactions_from_plaid(plaid_client, token, num_days)
-            transactions = merge_transactions(transactions, new_transactions)
-        except plaid.ApiException as e:
-            print(e)
+        if token not in requested:
+            response, institution = checkpoint.load(stages[token])
+        elif isinstance(requested[token], plaid.ApiException):
+            print(requested[token])
+            continue
+        elif isinstance(requested[token], Exception):
+            # Save the other responses before giving up, so a rerun doesn't
+            # request them again
+            error = error or requested[token]
             continue
-    fill_gsheet(gsheets_service, spreadsheet_id, transactions)
+        else:
+            response, institution = requested[token]
+            if archive is not None:
+                archive.append(response, institution, num_days)
+            if checkpoint is not None:
+                checkpoint.save(stages[token], (response, institution))
+        responses.append((response, institution))
+    if error is not None:
+        raise error
+    return responses
+
+
+def count_new_rows(responses: list[tuple[dict, dict]]) -> int:
+    """Number of transactions in the Plaid responses.
+    """
+    return sum(len(response.get('transactions') or []) for response, _ in responses)
+
+
+def merge_responses(
+        transactions: pd.DataFrame | TransactionTable,
+        responses: list[tuple[dict, dict]],
+        rule_set: RuleSet | None = None) -> pd.DataFrame | TransactionTable:
+    """Normalize the Plaid responses and merge them, in order, into the
+    transactions read from the sheet.
+
+    A TransactionTable (see read_gsheet_transactions) is merged with the
+    list-based pipeline from gsheets_plaid.records, which gives the same rows
+    as pandas. Responses without transactions are skipped.
+    """
+    responses = [(response, institution) for response, institution in responses if response.get('transactions')]
+    if isinstance(transactions, TransactionTable):
+        normalize, merge = normalize_transaction_records, merge_transaction_records
+    else:
+        normalize, merge = normalize_transactions, merge_transactions
+    for response, institution in responses:
+        new_transactions = normalize(response, institution)
+        if rule_set is not None:
+            new_transactions = rule_set.apply(new_transactions)
+        transactions = merge(transactions, new_transactions)
+    return transactions
+
+
+def sync_transactions(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        plaid_client: 'plaid_api.PlaidApi',
+        access_tokens: list[str],
+        spreadsheet_id: str,
+        num_days: int = 30,
+        differential: bool = False,
+        checkpoint: SyncCheckpoint | None = None,
+        sinks: list[TransactionSink] | None = None,
+        rules: list[CategoryRule] | None = None,
+        archive: TransactionArchive | None = None,
+        balances_sheet: str | None = None) -> None:
+    """Put transaction data into Google Sheet. Given the checkpoint of a
+    failed run, the sync resumes at the stage that failed. Synchronous
+    callers only (see fetch_transactions).
+    """
+    if differential and sinks:
+        raise ValueError('Output sinks need the full merged result and cannot be used with a differential sync.')
+    rule_set = RuleSet(rules) if rules else None
+    if checkpoint is not None:
+        checkpoint.check_inputs([spreadsheet_id, sorted(access_tokens), num_days, differential])
+    if checkpoint is not None and checkpoint.has('merged'):
+        write_full_sync(gsheets_service, spreadsheet_id, checkpoint.load('merged'), checkpoint, sinks)
+    else:
+        header = get_gsheet_header(gsheets_service, spreadsheet_id)
+        responses = fetch_sync_responses(
+            gsheets_service, plaid_client, access_tokens, spreadsheet_id, num_days, checkpoint, archive, balances_sheet)
+        if differential and header:
+            write_differential_sync(gsheets_service, spreadsheet_id, header, responses, rule_set)
+        else:
+            existing = read_gsheet_transactions(gsheets_service, spreadsheet_id, header, count_new_rows(responses))
+            transactions = merge_responses(existing, responses, rule_set)
+            if checkpoint is not None:
+                checkpoint.save('merged', transactions)
+            write_full_sync(gsheets_service, spreadsheet_id, transactions, checkpoint, sinks)
+    if checkpoint is not None:
+        checkpoint.clear()
+
+
+def fetch_sync_responses(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        plaid_client: 'plaid_api.PlaidApi',
+        access_tokens: list[str],
+        spreadsheet_id: str,
+        num_days: int = 30,
+        checkpoint: SyncCheckpoint | None = None,
+        archive: TransactionArchive | None = None,
+        balances_sheet: str | None = None) -> list[tuple[dict, dict]]:
+    """Fetch the Plaid responses (see fetch_transactions) and append today's
+    balances to ``balances_sheet`` if given.
+    """
+    responses = fetch_transactions(plaid_client, access_tokens, num_days, checkpoint, archive)
+    if balances_sheet:
+        append_balance_snapshots(gsheets_service, spreadsheet_id,
+            [(response, institution, date.today()) for response, institution in responses], balances_sheet)
+    return responses
+
+
+def write_full_sync(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        transactions: pd.DataFrame | TransactionTable,
+        checkpoint: SyncCheckpoint | None = None,
+        sinks: list[TransactionSink] | None = None) -> None:
+    """Rewrite the sheet with the merged transactions, then write them to
+    the sinks. The sheet isn't written again if the checkpoint says it was.
+    """
+    if not len(transactions):
+        return
+    if checkpoint is None or not checkpoint.has('filled'):
+        fill_gsheet(gsheets_service, spreadsheet_id, transactions)
+        if checkpoint is not None:
+            checkpoint.save('filled')
     apply_gsheet_formatting(gsheets_service, spreadsheet_id, transactions)
+    write_to_sinks(transactions, sinks or [])
+
+
+def write_differential_sync(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        spreadsheet_id: str,
+        header: list[str],
+        responses: list[tuple[dict, dict]],
+        rule_set: RuleSet | None = None) -> None:
+    """Read only the dedup columns of the sheet and write the new responses
+    in place (see write_gsheet_differential).
+    """
+    existing_keys = get_transaction_keys_from_gsheet(gsheets_service, spreadsheet_id, header=header)
+    new_transactions = [
+        normalize_transactions(response, institution) for response, institution in responses
+        if response.get('transactions')]
+    if rule_set is not None:
+        new_transactions = [rule_set.apply(new) for new in new_transactions]
+    deleted_rows, added_transactions = diff_transactions(existing_keys, new_transactions)
+    write_gsheet_differential(gsheets_service, spreadsheet_id, header, deleted_rows, added_transactions)
+
+
+def replay_transactions(
+        gsheets_service: 'googleapiclient.discovery.Resource',
+        archive: TransactionArchive,
+        spreadsheet_id: str,
+        sinks: list[TransactionSink] | None = None,
+        rules: list[CategoryRule] | None = None,
+        spreadsheet_range: str = 'Sheet1',
+        balances_sheet: str | None = None) -> None:
+    """Rebuild the Google Sheet from the archived Plaid responses, without
+    calling Plaid.
+
+    The responses are normalized and merged in the order they were fetched,
+    the same way the syncs that fetched them did, and the result replaces
+    the sheet. Rows that aren't in the archive (including custom categories
+    edited by hand) are not kept. The old rows are only cleared once the new
+    ones are written, so a failed write doesn't leave the sheet empty.
+
+    With ``balances_sheet``, the balances in the archived responses are
+    added to that sheet, dated by when each response was fetched. Days that
+    already have a snapshot are kept as they are.
+    """
+    records = list(archive.iter_records())
+    responses = [(record['response'], record['institution']) for record in records]
+    existing = TransactionTable([], []) if small_sync(0, count_new_rows(responses)) else pd.DataFrame()
+    transactions = merge_responses(existing, responses, RuleSet(rules) if rules else None)
+    if len(transactions):
+        fill_gsheet(gsheets_service, spreadsheet_id, transactions, spreadsheet_range)
+        clear_gsheet_outside(
+            gsheets_service, spreadsheet_id, len(transactions) + 1, len(transactions.columns), spreadsheet_range)
+        apply_gsheet_formatting(gsheets_service, spreadsheet_id, transactions)
+        write_to_sinks(transactions, sinks or [])
+    else:
+        gsheets_service.spreadsheets().values().clear(
+            spreadsheetId=spreadsheet_id,
+            range=spreadsheet_range,
+            body={},
+        ).execute()
+    if balances_sheet:
+        snapshots = [
+            (record['response'], record['institution'], datetime.fromisoformat(record['archived_at']).date())
+            for record in records]
+        append_balance_snapshots(gsheets_service, spreadsheet_id, snapshots, balances_sheet)
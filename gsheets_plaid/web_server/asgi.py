@@ -0,0 +1,18 @@
+"""ASGI entry point for serving the app with an ASGI server, eg.
+
+    pip install gsheets-plaid[asgi]
+    uvicorn gsheets_plaid.web_server.asgi:app
+
+The Flask app is wrapped with a2wsgi, which runs each request in a pool of
+ASGI_WORKERS threads. The async views (eg. /manage-plaid-items) fan out
+their Plaid calls with asyncio inside that request.
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from gsheets_plaid.web_server.main import app as wsgi_app
+
+ASGI_WORKERS = int(os.environ.get('GSHEETS_PLAID_ASGI_WORKERS', 32))
+
+app = WSGIMiddleware(wsgi_app, workers=ASGI_WORKERS)
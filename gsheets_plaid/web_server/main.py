@@ -1,24 +1,27 @@
+import asyncio
+import hashlib
 import io
 import json
 import os
 import re
+import threading
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 
-import google_auth_oauthlib.flow
 import googleapiclient.errors
 from dotenv import load_dotenv
-from flask import Flask, make_response, redirect, render_template, request, session, url_for
+from flask import Flask, g, make_response, redirect, render_template, request, session, url_for
 from google.auth.exceptions import RefreshError
 from google.auth.transport import requests
 from google.auth.transport.requests import Request as GoogleRequest
-from google.cloud import firestore, secretmanager
 from google.oauth2 import id_token
 from google.oauth2.credentials import Credentials
+from gsheets_plaid import __version__
 from gsheets_plaid.create_sheet import create_new_spreadsheet
-from gsheets_plaid.services import GOOGLE_SCOPES, generate_gsheets_service, generate_plaid_client
-from gsheets_plaid.sync import get_spreadsheet_url, sync_transactions
-from gsheets_plaid.web_server.session_manager import FirestoreSessionManager, FlaskSessionManager
-from plaid.api import plaid_api
+from gsheets_plaid.services import (GOOGLE_SCOPES, AsyncPlaidClient, generate_gsheets_service,
+                                    generate_plaid_client)
+from gsheets_plaid.web_server.session_manager import (FirestoreSessionManager, FlaskSessionManager,
+                                                      SQLiteSessionManager)
 from plaid.exceptions import ApiException as PlaidApiException
 from plaid.model.country_code import CountryCode
 from plaid.model.institutions_get_by_id_request import InstitutionsGetByIdRequest
@@ -30,32 +33,49 @@ from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
 from plaid.model.products import Products
 
+if TYPE_CHECKING:
+    import googleapiclient.discovery
+    from plaid.api import plaid_api
+
 TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
 
 app = Flask(__name__)
-plaid_client = None
-if os.environ.get('GOOGLE_CLOUD_PROJECT'):
+session_backend = os.environ.get(
+    'GSHEETS_PLAID_SESSION_BACKEND', 'firestore' if os.environ.get('GOOGLE_CLOUD_PROJECT') else 'flask')
+if session_backend == 'firestore':
+    from google.cloud import firestore
     session_manager = FirestoreSessionManager(firestore.Client())
     print('Using Firestore session manager')
+elif session_backend == 'sqlite':
+    session_manager = SQLiteSessionManager(os.environ.get('GSHEETS_PLAID_SESSION_DB', 'gsheets_plaid_sessions.db'))
+    print('Using SQLite session manager')
 else:
     session_manager = FlaskSessionManager(session)
     print('Using Flask session manager')
 enable_restrictions = bool(os.environ.get('GSHEETS_PLAID_RESTRICTIONS_ENABLED'))
+# The session cookies are only sent over HTTPS unless this is set (eg. for
+# local benchmarks over plain HTTP)
+secure_cookies = not os.environ.get('GSHEETS_PLAID_INSECURE_COOKIES')
+app.config.update(SESSION_COOKIE_SECURE=secure_cookies, SESSION_COOKIE_SAMESITE='Lax')
+app_initialized = False
+initialize_lock = threading.Lock()
 
 @app.before_request
-def load_session():
-    if request.endpoint in ('login', 'sign_in_with_google_callback', 'sign_out'):
+def initialize_app():
+    # Flask 2.3 removed before_first_request, so run the checks once per
+    # process from the first request instead.
+    global app_initialized
+    if app_initialized:
         return
-    if not session_manager.user_id:
-        user_id = request.cookies.get('user_id')
-        if not user_id:
-            return redirect(url_for('login'))
-        session_manager.register_user_id(user_id)
+    with initialize_lock:
+        if not app_initialized:
+            load_environment()
+            app_initialized = True
 
-@app.before_first_request
-def initialize_app():
+def load_environment():
     required_env_variables = ('GOOGLE_CLOUD_CLIENT_ID', 'GOOGLE_CLOUD_CLIENT_CONFIG', 'FLASK_SECRET_KEY')
     if os.environ.get('GOOGLE_CLOUD_PROJECT'):
+        from google.cloud import secretmanager
         project_id = os.environ.get('GOOGLE_CLOUD_PROJECT')
         secrets_client = secretmanager.SecretManagerServiceClient()
         name = f'projects/{project_id}/secrets/app_engine_python_env/versions/latest'
@@ -68,6 +88,22 @@ def initialize_app():
     if not all(env in os.environ for env in required_env_variables):
         raise EnvironmentError(f"The following environment variables are required: {required_env_variables}")
 
+@app.before_request
+def load_session():
+    if request.endpoint in ('login', 'sign_in_with_google_callback', 'sign_out'):
+        return
+    if not session_manager.user_id:
+        session_id = request.cookies.get('session_id')
+        if not session_id or not session_manager.resume_session(session_id):
+            return redirect(url_for('login'))
+
+@app.after_request
+def save_session(response):
+    # Flask also runs this for requests that raised, don't keep their writes
+    if response.status_code < 500:
+        session_manager.flush()
+    return response
+
 @app.route('/login')
 def login():
     return render_template('login.html', client_id=os.environ.get('GOOGLE_CLOUD_CLIENT_ID'))
@@ -79,7 +115,27 @@ def index():
         session_data = session_manager.get_session()
     except Exception:
         return redirect(url_for('login'))
-    return render_template('checklist.html', **status_check(session_data), username=session_data.get('greeting_name'))
+    if 'status_snapshot' not in session_data:
+        session_manager['status_snapshot'] = refresh_status_snapshot(session_data)
+    context = dict(status_check(session_data), username=session_data.get('greeting_name'))
+
+    # The page only depends on the session data, so let the browser reuse
+    # its copy until something changes.
+    etag = hashlib.sha1(json.dumps([__version__, context], sort_keys=True).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        resp = make_response('', 304)
+    else:
+        resp = make_response(render_template('checklist.html', **context))
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+@app.route('/refresh-status')
+def refresh_status():
+    session_data = session_manager.get_session()
+    session_manager['status_snapshot'] = refresh_status_snapshot(session_data)
+    return redirect(url_for('index'))
 
 @app.route('/sign-in-with-google-callback')
 def sign_in_with_google_callback():
@@ -88,7 +144,7 @@ def sign_in_with_google_callback():
         raise KeyError('No token found!')
     try:
         id_info = id_token.verify_oauth2_token(token, requests.Request(), os.environ.get('GOOGLE_CLOUD_CLIENT_ID'))
-        session_manager.register_user_id(id_info['sub'])
+        session_id = session_manager.start_session(id_info['sub'])
         session_data = session_manager.get_session()
         session_data['user_id'] = id_info['sub']
         session_data['greeting_name'] = id_info['given_name']
@@ -96,14 +152,15 @@ def sign_in_with_google_callback():
     except ValueError:
         raise ValueError('Invalid token!')
     resp = redirect(url_for('index'))
-    resp.set_cookie('user_id', id_info['sub'], httponly=True)
+    resp.set_cookie('session_id', session_id, max_age=session_manager.max_age, secure=secure_cookies,
+        httponly=True, samesite='Lax')
     return resp
 
 @app.route('/sign-out')
 def sign_out():
-    session_manager.clear_session()
+    session_manager.end_session(request.cookies.get('session_id'))
     resp = redirect(url_for('index'))
-    resp.delete_cookie('user_id', httponly=True)
+    resp.delete_cookie('session_id', secure=secure_cookies, httponly=True, samesite='Lax')
     return resp
 
 @app.route('/edit-plaid-credentials', methods=['GET', 'POST'])
@@ -125,9 +182,9 @@ def edit_plaid_credentials():
         session_data['plaid_env'] = determine_plaid_env(client_id, secret)
         session_data['plaid_client_id'] = client_id
         session_data['plaid_secret'] = secret
+        g.pop('plaid_client', None)
+        refresh_status_snapshot(session_data)
         session_manager.set_session(session_data)
-        global plaid_client
-        plaid_client = None
         return redirect(url_for('edit_plaid_credentials'))
     else:
         raise ValueError('Invalid request method')
@@ -140,6 +197,8 @@ def unquote(url):
 
 @app.route('/authorize-google-credentials')
 def authorize_google_credentials():
+    import google_auth_oauthlib.flow
+
     # Create flow instance to manage the OAuth 2.0 Authorization Grant Flow steps.
     client_config = parse_google_cloud_client_config()
     flow = google_auth_oauthlib.flow.Flow.from_client_config(client_config, GOOGLE_SCOPES)
@@ -166,6 +225,7 @@ def authorize_google_credentials():
 def google_oauth_callback():
     # Specify the state when creating the flow in the callback so that it can
     # verified in the authorization server response.
+    import google_auth_oauthlib.flow
     state = request.cookies.get('google_oauth_state')
     client_config = parse_google_cloud_client_config()
     flow = google_auth_oauthlib.flow.Flow.from_client_config(client_config, GOOGLE_SCOPES, state=state)
@@ -185,6 +245,7 @@ def google_oauth_callback():
 
 @app.route('/manage-spreadsheets', methods=['GET', 'POST'])
 def manage_spreadsheets():
+    from gsheets_plaid.sync import get_spreadsheet_url
     session_data = session_manager.get_session()
     try:
         google_credentials = session_data['google_credentials']
@@ -206,9 +267,18 @@ def manage_spreadsheets():
         raise ValueError('Invalid request method')
 
 @app.route('/manage-plaid-items')
-def manage_plaid_items():
+async def manage_plaid_items():
     session_data = session_manager.get_session()
-    link_token = request_link_token(session_data)
+    access_tokens = get_plaid_items(session_data, remove_inactive_items=False).values()
+    # Invalid credentials make the link token request fail, so don't spend a
+    # Plaid call validating them first
+    plaid_client = AsyncPlaidClient(build_plaid_client(session_data, validate=False))
+    link_token, item_info = await asyncio.gather(
+        request_link_token(plaid_client, session_data),
+        get_plaid_item_info(plaid_client, access_tokens, session_data),
+        return_exceptions=True)
+    if isinstance(link_token, Exception):
+        raise link_token
     if not link_token:
         return f"""
         An error occurred when authenticating with Plaid. Make sure that you whitelist the
@@ -218,8 +288,8 @@ def manage_plaid_items():
         <br><br>
         <a href={url_for('index')}>Back to home</a>
         """
-    access_tokens = get_plaid_items(session_data, remove_inactive_items=False).values()
-    item_info = get_plaid_item_info(access_tokens, session_data)
+    if isinstance(item_info, Exception):
+        raise item_info
     plaid_env = session_data.get('plaid_env', 'sandbox')
     resp = make_response(render_template('plaid_items_form.html', plaid_link_token=link_token,
         plaid_oauth_redirect=False, plaid_items=item_info, plaid_env=plaid_env))
@@ -244,11 +314,15 @@ def plaid_link_success():
     if 'plaid_items' not in session_data:
         session_data['plaid_items'] = {}
     session_data['plaid_items'][item_id] = access_token
+    refresh_status_snapshot(session_data)
     session_manager.set_session(session_data)
     return redirect(url_for('manage_plaid_items'))
 
 @app.route('/sync')
 def sync():
+    # pandas and numpy are only needed for syncing, so don't load them until
+    # the first sync request.
+    from gsheets_plaid.sync import sync_transactions
     session_data = session_manager.get_session()
     if not user_allowed_sync(session_data):
         return f'''
@@ -267,6 +341,7 @@ def sync():
     spreadsheet_id = session_data.get(f'spreadsheet_id')
     sync_transactions(gsheets_service, plaid_client, plaid_access_tokens, spreadsheet_id, num_days)
     session_manager['last_sync'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+    session_manager['status_snapshot'] = refresh_status_snapshot(session_data)
     return redirect(url_for('index'))
 
 @app.route('/remove-plaid-item')
@@ -278,6 +353,7 @@ def remove_plaid_item():
     plaid_request = ItemRemoveRequest(access_token=token)
     plaid_client.item_remove(plaid_request)
     del session_data['plaid_items'][item_id]
+    refresh_status_snapshot(session_data)
     session_manager.set_session(session_data)
     redirect_url = request.args.get('redirect_url', url_for('index'))
     return redirect(redirect_url)
@@ -296,17 +372,37 @@ def delete_my_data():
     return redirect(url_for('sign_out'))
 
 def status_check(session_data: dict) -> dict:
-    plaid_env = session_data.get('plaid_env', 'sandbox')
-    plaid_items = get_plaid_items(session_data)
+    """Dashboard status. The Plaid checks come from the stored snapshot, the
+    rest is read straight from the session data.
+    """
+    plaid_status = session_data.get('status_snapshot') or refresh_status_snapshot(session_data)
     return {
         'google_creds_status': 'google_credentials' in session_data,
         'spreadsheet_exists': f'spreadsheet_id' in session_data and f'spreadsheet_url' in session_data,
-        'plaid_creds_status': validate_plaid_credentials(plaid_env, session_data.get('plaid_client_id'), session_data.get(f'plaid_secret')),
-        'plaid_access_tokens_status': validate_plaid_access_tokens(plaid_items, session_data),
+        'plaid_creds_status': plaid_status['plaid_creds_status'],
+        'plaid_access_tokens_status': plaid_status['plaid_access_tokens_status'],
+        'status_checked_at': plaid_status['checked_at'],
         'spreadsheet_url': session_data.get(f'spreadsheet_url'),
         'user_allowed_sync': user_allowed_sync(session_data),
     }
 
+def refresh_status_snapshot(session_data: dict) -> dict:
+    """Validate the Plaid credentials and access tokens live (1 + N Plaid
+    calls) and store the result in session_data['status_snapshot'].
+
+    Call this whenever the Plaid credentials or items change, and save the
+    session data afterwards.
+    """
+    plaid_env = session_data.get('plaid_env', 'sandbox')
+    plaid_items = get_plaid_items(session_data)
+    snapshot = {
+        'plaid_creds_status': validate_plaid_credentials(plaid_env, session_data.get('plaid_client_id'), session_data.get(f'plaid_secret')),
+        'plaid_access_tokens_status': app.ensure_sync(validate_plaid_access_tokens)(plaid_items, session_data),
+        'checked_at': datetime.now().strftime(TIMESTAMP_FORMAT),
+    }
+    session_data['status_snapshot'] = snapshot
+    return snapshot
+
 def parse_google_cloud_client_config() -> dict:
     env_variable = os.environ.get('GOOGLE_CLOUD_CLIENT_CONFIG')
     if not env_variable:
@@ -350,18 +446,21 @@ def validate_plaid_credentials(plaid_env: str, client_id: str, secret: str) -> b
         return False
     return True
 
-def validate_plaid_access_tokens(plaid_items: dict, session_data: dict) -> bool:
+async def validate_plaid_access_tokens(plaid_items: dict, session_data: dict) -> bool:
     if len(plaid_items) == 0:
         return None
     try:
-        plaid_client = build_plaid_client(session_data)
+        plaid_client = AsyncPlaidClient(build_plaid_client(session_data))
     except ValueError:
         return False
-    for access_token in plaid_items.values():
-        try:
-            plaid_client.item_get(ItemGetRequest(access_token))
-        except PlaidApiException:
+    results = await asyncio.gather(
+        *(plaid_client.item_get(ItemGetRequest(access_token)) for access_token in plaid_items.values()),
+        return_exceptions=True)
+    for result in results:
+        if isinstance(result, PlaidApiException):
             return False
+        if isinstance(result, Exception):
+            raise result
     return True
 
 def get_plaid_items(session_data: dict, remove_inactive_items: bool = True) -> dict:
@@ -372,7 +471,7 @@ def get_plaid_items(session_data: dict, remove_inactive_items: bool = True) -> d
     return plaid_items
 
 def lookup_spreadsheet_name(
-        gsheets_service: googleapiclient.discovery.Resource,
+        gsheets_service: 'googleapiclient.discovery.Resource',
         session_data: dict) -> str:
     spreadsheet_id = session_data.get(f'spreadsheet_id')
     if not spreadsheet_id:
@@ -384,7 +483,7 @@ def lookup_spreadsheet_name(
         forget_spreadsheet()
         return ''
 
-def build_gsheets_service(google_credentials: dict) -> googleapiclient.discovery.Resource:
+def build_gsheets_service(google_credentials: dict) -> 'googleapiclient.discovery.Resource':
     credentials = Credentials.from_authorized_user_info(google_credentials, GOOGLE_SCOPES)
     if credentials.expired and credentials.refresh_token:
         try:
@@ -398,8 +497,7 @@ def build_gsheets_service(google_credentials: dict) -> googleapiclient.discovery
     gsheets_service = generate_gsheets_service(credentials)
     return gsheets_service
 
-def request_link_token(session_data: dict) -> str:
-    plaid_client = build_plaid_client(session_data)
+async def request_link_token(plaid_client: AsyncPlaidClient, session_data: dict) -> str:
     request = LinkTokenCreateRequest(
         products=[Products('transactions')],
         client_name="GSheets-Plaid",
@@ -411,15 +509,15 @@ def request_link_token(session_data: dict) -> str:
             client_user_id=session_data['user_id']
         ))
     try:
-        response = plaid_client.link_token_create(request)
+        response = await plaid_client.link_token_create(request)
         link_token = response['link_token']
     except PlaidApiException as e:
         print(e)
         link_token = None
     return link_token
 
-def request_link_update_token(
-        plaid_client: plaid_api.PlaidApi,
+async def request_link_update_token(
+        plaid_client: AsyncPlaidClient,
         access_token: str,
         session_data: dict) -> str:
     request = LinkTokenCreateRequest(
@@ -433,26 +531,29 @@ def request_link_update_token(
         ),
         access_token=access_token)
     try:
-        response = plaid_client.link_token_create(request)
+        response = await plaid_client.link_token_create(request)
         link_token = response['link_token']
     except PlaidApiException as e:
         print(e)
         link_token = None
     return link_token
 
-def build_plaid_client(session_data: dict) -> plaid_api.PlaidApi:
-    global plaid_client
-    if plaid_client is not None:
-        return plaid_client
+def build_plaid_client(session_data: dict, validate: bool = True) -> 'plaid_api.PlaidApi':
+    # Cache the validated client for the rest of the request. It holds the
+    # current user's credentials, so it must not be shared between requests.
+    if 'plaid_client' in g:
+        return g.plaid_client
     plaid_env = session_data.get('plaid_env', 'sandbox')
     if plaid_env not in ('sandbox', 'development', 'production'):
         raise ValueError(plaid_env)
     plaid_client_id = session_data.get('plaid_client_id')
     plaid_secret = session_data.get(f'plaid_secret')
+    if not validate:
+        return generate_plaid_client(plaid_env, plaid_client_id, plaid_secret)
     if not validate_plaid_credentials(plaid_env, plaid_client_id, plaid_secret):
         raise ValueError('Invalid Plaid credentials')
-    plaid_client = generate_plaid_client(plaid_env, plaid_client_id, plaid_secret)
-    return plaid_client
+    g.plaid_client = generate_plaid_client(plaid_env, plaid_client_id, plaid_secret)
+    return g.plaid_client
 
 def item_public_token_exchange(public_token: str, session_data: dict) -> tuple[str, str]:
     plaid_client = build_plaid_client(session_data)
@@ -462,31 +563,34 @@ def item_public_token_exchange(public_token: str, session_data: dict) -> tuple[s
     item_id = response['item_id']
     return item_id, access_token
 
-def get_plaid_item_info(access_tokens: list, session_data: dict) -> tuple:
-    results = []
-    plaid_client = build_plaid_client(session_data)
-    for token in access_tokens:
-        try:
-            response = plaid_client.item_get(ItemGetRequest(token))
-            ins_id = response['item']['institution_id']
-            healthy_state = response['item']['error'] == None
-            ins_request = InstitutionsGetByIdRequest(ins_id, [CountryCode('US')])
-            response = plaid_client.institutions_get_by_id(ins_request)
-            ins_name = response['institution']['name']
-            link_update_token = request_link_update_token(plaid_client, token, session_data)
-            token_env = re.findall(r"access-(\w+)-.*", token)[0]
-        except PlaidApiException as e:
-            error_code = json.loads(e.body)['error_code']
-            if error_code == 'INVALID_ACCESS_TOKEN':
-                token_env_regex = re.findall(r"access-(\w+)-.*", token)
-                token_env = token_env_regex[0] if token_env_regex else 'unknown'
-                ins_name = f'{token_env} institution'
-                healthy_state = None
-                link_update_token = None
-            else:
-                raise e
-        results.append((ins_name, token_env, healthy_state, link_update_token, token))
-    return results
+async def get_plaid_item_info(plaid_client: AsyncPlaidClient, access_tokens: list, session_data: dict) -> list:
+    """Look up the institution and status of every item. The items are
+    looked up concurrently.
+    """
+    return list(await asyncio.gather(*(
+        get_item_info(plaid_client, token, session_data) for token in access_tokens)))
+
+async def get_item_info(plaid_client: AsyncPlaidClient, token: str, session_data: dict) -> tuple:
+    try:
+        response = await plaid_client.item_get(ItemGetRequest(token))
+        ins_id = response['item']['institution_id']
+        healthy_state = response['item']['error'] == None
+        ins_request = InstitutionsGetByIdRequest(ins_id, [CountryCode('US')])
+        response = await plaid_client.institutions_get_by_id(ins_request)
+        ins_name = response['institution']['name']
+        link_update_token = await request_link_update_token(plaid_client, token, session_data)
+        token_env = re.findall(r"access-(\w+)-.*", token)[0]
+    except PlaidApiException as e:
+        error_code = json.loads(e.body)['error_code']
+        if error_code == 'INVALID_ACCESS_TOKEN':
+            token_env_regex = re.findall(r"access-(\w+)-.*", token)
+            token_env = token_env_regex[0] if token_env_regex else 'unknown'
+            ins_name = f'{token_env} institution'
+            healthy_state = None
+            link_update_token = None
+        else:
+            raise e
+    return (ins_name, token_env, healthy_state, link_update_token, token)
 
 @app.route('/revoke-google-credentials')
 def revoke():
@@ -1,19 +1,63 @@
+import copy
+import json
+import queue
+import secrets
+import sqlite3
+import time
 from abc import ABC, abstractmethod
-from typing import Any
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterator
 
-from flask import Flask
-from google.cloud import firestore
+from flask import Flask, g
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
+# Seconds a session cookie stays valid after sign-in
+SESSION_MAX_AGE = 14 * 24 * 60 * 60
 
 
 class SessionManager(ABC):
-    def __init__(self) -> None:
-        self.user_id = None
+    """Stores per-user session data.
+
+    A single instance is shared by every request, so the current user is
+    kept on flask.g, which is local to each request.
+    """
+    max_age = SESSION_MAX_AGE
+
+    @property
+    def user_id(self) -> str | None:
+        return g.get('user_id')
 
     def register_user_id(self, user_id: str) -> None:
-        self.user_id = user_id
-    
+        g.user_id = user_id
+
     def clear_session(self) -> None:
-        self.user_id = None
+        g.pop('user_id', None)
+
+    def start_session(self, user_id: str) -> str:
+        """Register a user who just signed in and return the value for the
+        session cookie. By default the cookie holds the user id itself.
+        """
+        self.register_user_id(user_id)
+        return user_id
+
+    def resume_session(self, session_id: str) -> bool:
+        """Register the user that a session cookie belongs to. Returns False
+        if the cookie doesn't belong to a session.
+        """
+        self.register_user_id(session_id)
+        return True
+
+    def end_session(self, session_id: str | None) -> None:
+        """Sign out, so the session cookie can't be used again.
+        """
+        self.clear_session()
+
+    def flush(self) -> None:
+        """Persist any writes buffered during the request. Backends that write
+        straight through don't need to do anything.
+        """
 
     @abstractmethod
     def get_session(self) -> dict:
@@ -41,23 +85,25 @@ class SessionManager(ABC):
 
 
 class FirestoreSessionManager(SessionManager):
-    def __init__(self, firestore_client: firestore.Client) -> None:
+    def __init__(self, firestore_client: 'firestore.Client') -> None:
         super().__init__()
         self.db = firestore_client
         self.users = self.db.collection('users')
-        self.doc_ref = None
+
+    @property
+    def doc_ref(self) -> 'firestore.DocumentReference | None':
+        if not self.user_id:
+            return None
+        return self.users.document(document_id=self.user_id)
 
     def register_user_id(self, user_id: str) -> None:
         super().register_user_id(user_id)
-        self.doc_ref = self.users.document(document_id=user_id)
+        # Checked on every request: the document may have been deleted by
+        # /delete-my-data in another worker process
         doc = self.doc_ref.get()
         if not doc.exists:
             self.doc_ref.set({})
 
-    def clear_session(self) -> None:
-        super().clear_session()
-        self.doc_ref = None
-
     def get_session(self) -> dict:
         if not self.user_id:
             raise ValueError('Call register_user_id() first.')
@@ -70,8 +116,7 @@ class FirestoreSessionManager(SessionManager):
     
     def delete_session(self) -> None:
         self.doc_ref.delete()
-        self.doc_ref = None
-        self.user_id = None
+        self.clear_session()
 
     def __getitem__(self, key: str) -> Any:
         return self.get_session()[key]
@@ -80,6 +125,7 @@ class FirestoreSessionManager(SessionManager):
         self.doc_ref.set({key: value}, merge=True)
     
     def __delitem__(self, key: str) -> None:
+        from google.cloud import firestore
         self.doc_ref.update({key: firestore.DELETE_FIELD})
 
 
@@ -106,7 +152,7 @@ class FlaskSessionManager(SessionManager):
 
     def delete_session(self) -> None:
         del self.session[self.user_id]
-        self.user_id = None
+        self.clear_session()
 
     def __getitem__(self, key: str) -> Any:
         return self.get_session()[key]
@@ -118,3 +164,136 @@ class FlaskSessionManager(SessionManager):
     def __delitem__(self, key: str) -> None:
         del self.session[self.user_id][key]
         self.session.modified = True
+
+
+class SQLiteSessionManager(SessionManager):
+    """Keeps session data in a local SQLite database, so only a session id
+    cookie is sent back and forth (unlike FlaskSessionManager, whose signed
+    cookie grows with every Plaid item).
+
+    Session ids are random and mapped to the user on the server, so the
+    cookie doesn't reveal the user id and can't be forged from it. They
+    expire ``max_age`` seconds after sign-in and expired ids are deleted.
+
+    Connections are pooled. Reads are cached and writes are buffered on
+    flask.g, then written in one transaction by flush() at the end of the
+    request. The app skips flush() for requests that fail with a server
+    error, so their writes are dropped.
+    """
+    def __init__(self, db_path: str, pool_size: int = 8, max_age: int = SESSION_MAX_AGE) -> None:
+        super().__init__()
+        self.db_path = db_path
+        self.max_age = max_age
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        with self.connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS session_ids '
+                '(session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, created_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS session_ids_user_id ON session_ids (user_id)')
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the pool and commit (or roll back) when
+        done with it.
+        """
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                self.pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def register_user_id(self, user_id: str) -> None:
+        super().register_user_id(user_id)
+        g.pop('session_data', None)
+        g.session_dirty = False
+
+    def clear_session(self) -> None:
+        self.flush()
+        super().clear_session()
+        g.pop('session_data', None)
+
+    def start_session(self, user_id: str) -> str:
+        self.register_user_id(user_id)
+        session_id = secrets.token_urlsafe(32)
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute('DELETE FROM session_ids WHERE created_at < ?', (now - self.max_age,))
+            conn.execute(
+                'INSERT INTO session_ids (session_id, user_id, created_at) VALUES (?, ?, ?)',
+                (session_id, user_id, now))
+        return session_id
+
+    def resume_session(self, session_id: str) -> bool:
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT user_id, created_at FROM session_ids WHERE session_id = ?', (session_id,)).fetchone()
+            if row is not None and row[1] < time.time() - self.max_age:
+                conn.execute('DELETE FROM session_ids WHERE session_id = ?', (session_id,))
+                row = None
+        if row is None:
+            return False
+        self.register_user_id(row[0])
+        return True
+
+    def end_session(self, session_id: str | None) -> None:
+        if session_id:
+            with self.connection() as conn:
+                conn.execute('DELETE FROM session_ids WHERE session_id = ?', (session_id,))
+        self.clear_session()
+
+    def flush(self) -> None:
+        if not g.get('session_dirty') or not self.user_id:
+            return
+        with self.connection() as conn:
+            conn.execute(
+                'INSERT INTO sessions (user_id, data) VALUES (?, ?) '
+                'ON CONFLICT (user_id) DO UPDATE SET data = excluded.data',
+                (self.user_id, json.dumps(g.session_data)))
+        g.session_dirty = False
+
+    def load_session(self) -> dict:
+        """The current user's session data, read at most once per request.
+        """
+        if not self.user_id:
+            raise ValueError('Call register_user_id() first.')
+        if 'session_data' not in g:
+            with self.connection() as conn:
+                row = conn.execute('SELECT data FROM sessions WHERE user_id = ?', (self.user_id,)).fetchone()
+            g.session_data = json.loads(row[0]) if row else {}
+        return g.session_data
+
+    def get_session(self) -> dict:
+        return copy.deepcopy(self.load_session())
+
+    def set_session(self, data: dict) -> None:
+        if not self.user_id:
+            raise ValueError('Call register_user_id() first.')
+        g.session_data = copy.deepcopy(data)
+        g.session_dirty = True
+
+    def delete_session(self) -> None:
+        with self.connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE user_id = ?', (self.user_id,))
+            conn.execute('DELETE FROM session_ids WHERE user_id = ?', (self.user_id,))
+        g.session_dirty = False
+        self.clear_session()
+
+    def __getitem__(self, key: str) -> Any:
+        return copy.deepcopy(self.load_session()[key])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.load_session()[key] = value
+        g.session_dirty = True
+
+    def __delitem__(self, key: str) -> None:
+        del self.load_session()[key]
+        g.session_dirty = True
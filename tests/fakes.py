@@ -0,0 +1,317 @@
+"""In-memory stand-ins for the Sheets API resource and the Plaid client, and
+a generator of Plaid transactions_get responses.
+"""
+import random
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+DEFAULT_ROW_COUNT = 1000
+DEFAULT_COLUMN_COUNT = 26
+CELL_PATTERN = re.compile(r'([A-Z]*)(\d*)')
+
+
+class FakeRequest:
+    def __init__(self, func: Callable[[], Any]) -> None:
+        self.func = func
+
+    def execute(self) -> Any:
+        return self.func()
+
+
+class FakeSheetsService:
+    """Stores the cells of each sheet as the text the API would return and
+    follows the API's quirks that the sync relies on: trailing empty rows
+    and cells are left out of the values read, update only writes the cells
+    it is given, and append adds rows after the last non-empty row.
+    """
+    def __init__(self) -> None:
+        self.sheets = {'Sheet1': {'sheetId': 0, 'values': [], 'rowCount': DEFAULT_ROW_COUNT}}
+        self.calls = []
+
+    def spreadsheets(self) -> 'FakeSheetsService':
+        return self
+
+    def values(self) -> 'FakeSheetsService':
+        return self
+
+    def sheet_values(self, title: str = 'Sheet1') -> list[list[str]]:
+        """The sheet's rows with the trailing empty rows and cells left out.
+        """
+        return trim_rows([list(row) for row in self.sheets[title]['values']])
+
+    def set_values(self, values: list[list[Any]], title: str = 'Sheet1') -> None:
+        self.sheets[title]['values'] = [[cell_text(cell) for cell in row] for row in values]
+
+    def get(self, spreadsheetId: str, range: str | None = None, fields: str | None = None) -> FakeRequest:
+        self.calls.append('get' if range is None else 'values.get')
+        if range is None:
+            return FakeRequest(lambda: {'sheets': [
+                {'properties': {
+                    'title': title,
+                    'sheetId': sheet['sheetId'],
+                    'gridProperties': {
+                        'rowCount': max(sheet['rowCount'], len(sheet['values'])),
+                        'columnCount': max([DEFAULT_COLUMN_COUNT, *map(len, sheet['values'])]),
+                    },
+                }} for title, sheet in self.sheets.items()]})
+        return FakeRequest(lambda: self.read_range(range))
+
+    def batchGet(self, spreadsheetId: str, ranges: list[str], majorDimension: str = 'ROWS') -> FakeRequest:
+        self.calls.append('values.batchGet')
+        return FakeRequest(lambda: {
+            'valueRanges': [self.read_range(cell_range, majorDimension) for cell_range in ranges]})
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: dict) -> FakeRequest:
+        self.calls.append('values.update')
+
+        def update_values() -> dict:
+            title, (start_row, start_col, _, _) = parse_range(range)
+            values = self.sheets[title]['values']
+            for row_offset, row in enumerate(body['values']):
+                row_idx = start_row + row_offset
+                while len(values) <= row_idx:
+                    values.append([])
+                cells = values[row_idx]
+                cells.extend([''] * (start_col + len(row) - len(cells)))
+                cells[start_col:start_col + len(row)] = [cell_text(cell) for cell in row]
+            return {}
+        return FakeRequest(update_values)
+
+    def append(
+            self,
+            spreadsheetId: str,
+            range: str,
+            valueInputOption: str,
+            insertDataOption: str,
+            body: dict) -> FakeRequest:
+        self.calls.append('values.append')
+
+        def append_values() -> dict:
+            title, _ = parse_range(range)
+            values = self.sheets[title]['values'] = self.sheet_values(title)
+            values.extend([cell_text(cell) for cell in row] for row in body['values'])
+            return {}
+        return FakeRequest(append_values)
+
+    def clear(self, spreadsheetId: str, range: str, body: dict) -> FakeRequest:
+        self.calls.append('values.clear')
+        return FakeRequest(lambda: self.clear_range(range) or {})
+
+    def batchClear(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        self.calls.append('values.batchClear')
+        return FakeRequest(lambda: [self.clear_range(cell_range) for cell_range in body['ranges']] and {})
+
+    def clear_range(self, cell_range: str) -> None:
+        title, (start_row, start_col, end_row, end_col) = parse_range(cell_range)
+        for row in self.sheets[title]['values'][start_row:end_row]:
+            row[start_col:end_col] = [''] * len(row[start_col:end_col])
+
+    def batchUpdate(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        self.calls.append('batchUpdate')
+        return FakeRequest(lambda: [self.apply_request(request) for request in body['requests']] and {})
+
+    def apply_request(self, request: dict) -> None:
+        if 'addSheet' in request:
+            properties = request['addSheet']['properties']
+            self.sheets[properties['title']] = {
+                'sheetId': properties['sheetId'], 'values': [], 'rowCount': DEFAULT_ROW_COUNT}
+        elif 'deleteDimension' in request:
+            cell_range = request['deleteDimension']['range']
+            del self.sheet_by_id(cell_range['sheetId'])[cell_range['startIndex']:cell_range['endIndex']]
+        elif 'sortRange' in request:
+            cell_range = request['sortRange']['range']
+            values = self.sheet_by_id(cell_range['sheetId'])
+            rows = trim_rows(values[cell_range['startRowIndex']:])
+            for spec in reversed(request['sortRange']['sortSpecs']):
+                idx = spec['dimensionIndex']
+                rows.sort(
+                    key=lambda row: (row[idx] if idx < len(row) else '').lower(),
+                    reverse=spec['sortOrder'] == 'DESCENDING')
+            values[cell_range['startRowIndex']:] = rows
+
+    def sheet_by_id(self, sheet_id: int) -> list[list[str]]:
+        return next(sheet['values'] for sheet in self.sheets.values() if sheet['sheetId'] == sheet_id)
+
+    def read_range(self, cell_range: str, major_dimension: str = 'ROWS') -> dict:
+        title, (start_row, start_col, end_row, end_col) = parse_range(cell_range)
+        rows = [row[start_col:end_col] for row in self.sheets[title]['values'][start_row:end_row]]
+        rows = trim_rows(rows)
+        if major_dimension == 'COLUMNS':
+            width = max(map(len, rows), default=0)
+            rows = trim_rows([[row[idx] if idx < len(row) else '' for row in rows] for idx in range(width)])
+        return {'range': cell_range, 'values': rows} if rows else {'range': cell_range}
+
+
+def parse_range(cell_range: str) -> tuple[str, tuple[int, int, int | None, int | None]]:
+    """Split A1 notation into the sheet title and zero-based, end-exclusive
+    (start_row, start_col, end_row, end_col). Open ends are None.
+    """
+    title, _, cells = cell_range.partition('!')
+    title = title.strip("'").replace("''", "'")
+    if not cells:
+        return title, (0, 0, None, None)
+    start, _, end = cells.partition(':')
+    start_col, start_row = CELL_PATTERN.fullmatch(start).groups()
+    end_col, end_row = CELL_PATTERN.fullmatch(end or start).groups()
+    return title, (
+        int(start_row) - 1 if start_row else 0,
+        column_index(start_col) if start_col else 0,
+        int(end_row) if end_row else None,
+        column_index(end_col) + 1 if end_col else None,
+    )
+
+
+def column_index(letters: str) -> int:
+    idx = 0
+    for letter in letters:
+        idx = idx * 26 + ord(letter) - ord('A') + 1
+    return idx - 1
+
+
+def trim_rows(rows: list[list[str]]) -> list[list[str]]:
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] == '':
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def cell_text(cell: Any) -> str:
+    if isinstance(cell, bool):
+        return str(cell).upper()
+    return '' if cell is None else str(cell)
+
+
+class FakeResponse(dict):
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+class FakePlaidClient:
+    """Returns the given (transactions_get response, institution) for each
+    access token, and records the name of every method called.
+    """
+    def __init__(self, responses: dict[str, tuple[dict, dict]]) -> None:
+        self.responses = responses
+        self.calls = []
+
+    def transactions_get(self, request: Any) -> FakeResponse:
+        self.calls.append('transactions_get')
+        return FakeResponse(self.responses[request.access_token][0])
+
+    def institutions_get_by_id(self, request: Any) -> FakeResponse:
+        self.calls.append('institutions_get_by_id')
+        for response, institution in self.responses.values():
+            if response['item']['institution_id'] == request.institution_id:
+                return FakeResponse({'institution': institution})
+        raise KeyError(request.institution_id)
+
+    def institutions_get(self, request: Any) -> FakeResponse:
+        self.calls.append('institutions_get')
+        return FakeResponse({'institutions': []})
+
+    def item_get(self, request: Any) -> FakeResponse:
+        self.calls.append('item_get')
+        return FakeResponse({'item': dict(self.responses[request.access_token][0]['item'], error=None)})
+
+    def item_public_token_exchange(self, request: Any) -> FakeResponse:
+        """Exchanges 'public-<env>-<item_id>' for 'access-<env>-<item_id>'.
+        """
+        self.calls.append('item_public_token_exchange')
+        access_token = request.public_token.replace('public-', 'access-', 1)
+        item_id = self.responses[access_token][0]['item']['item_id']
+        return FakeResponse({'access_token': access_token, 'item_id': item_id})
+
+    def item_remove(self, request: Any) -> FakeResponse:
+        self.calls.append('item_remove')
+        return FakeResponse({})
+
+    def link_token_create(self, request: Any) -> FakeResponse:
+        self.calls.append('link_token_create')
+        return FakeResponse({'link_token': 'link-sandbox-token'})
+
+
+def make_response(
+        rng: random.Random,
+        item_id: str,
+        num_transactions: int,
+        start: int = 0,
+        pending_fraction: float = 0.3) -> tuple[dict, dict]:
+    """A transactions_get response with ``num_transactions`` random
+    transactions numbered from ``start``, and its institution.
+    """
+    accounts = [
+        {
+            'account_id': f'{item_id}-account{idx}',
+            'balances': {'current': 100.0 * idx, 'available': None, 'iso_currency_code': 'USD'},
+            'name': f'Account {idx}',
+            'type': 'depository',
+            'subtype': 'checking',
+        } for idx in range(3)]
+    transactions = []
+    for idx in range(start, start + num_transactions):
+        day = date(2024, 1, 1) + timedelta(days=rng.randint(0, 40))
+        transactions.append({
+            'transaction_id': f'{item_id}-{idx}',
+            'pending_transaction_id': None,
+            'pending': rng.random() < pending_fraction,
+            'account_id': f'{item_id}-account{rng.randint(0, 2)}',
+            'date': day,
+            'datetime': None if rng.random() < 0.7 else datetime(day.year, day.month, day.day, rng.randint(0, 23)),
+            'name': rng.choice(['Uber', 'Starbucks', 'Amazon', 'amazon', 'Rent']),
+            'merchant_name': rng.choice([None, 'Uber', 'Starbucks']),
+            'amount': round(rng.uniform(-100, 100), 2),
+            'iso_currency_code': 'USD',
+            'unofficial_currency_code': None,
+            'payment_channel': 'online',
+            'category_id': '1',
+            'category': rng.choice([None, ['Food'], ['Food', 'Coffee'], ['Travel', 'Taxi', 'Ride']]),
+            'personal_finance_category': rng.choice([None, {'primary': 'FOOD', 'detailed': 'FOOD_COFFEE'}]),
+            'location': rng.choice([None, {'city': 'SF', 'region': 'CA', 'lat': 37.1, 'lon': None}]),
+        })
+    item = {'item_id': item_id, 'institution_id': f'ins_{item_id}', 'consent_expiration_time': None}
+    return {'transactions': transactions, 'accounts': accounts, 'item': item}, {'name': f'Bank {item_id}'}
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, data: dict | None) -> None:
+        self.data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> dict | None:
+        return None if self.data is None else dict(self.data)
+
+
+class FakeDocumentReference:
+    def __init__(self, documents: dict[str, dict], document_id: str) -> None:
+        self.documents = documents
+        self.document_id = document_id
+
+    def get(self) -> FakeDocumentSnapshot:
+        return FakeDocumentSnapshot(self.documents.get(self.document_id))
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        if merge and self.document_id in self.documents:
+            self.documents[self.document_id].update(data)
+        else:
+            self.documents[self.document_id] = dict(data)
+
+    def delete(self) -> None:
+        self.documents.pop(self.document_id, None)
+
+
+class FakeFirestoreClient:
+    """Documents are kept in a dict shared by every client made from it,
+    like several worker processes using the same database.
+    """
+    def __init__(self, documents: dict[str, dict] | None = None) -> None:
+        self.documents = {} if documents is None else documents
+
+    def collection(self, name: str) -> 'FakeFirestoreClient':
+        return self
+
+    def document(self, document_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self.documents, document_id)
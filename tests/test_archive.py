@@ -0,0 +1,56 @@
+import os
+import random
+
+import pytest
+
+from gsheets_plaid import sync
+from gsheets_plaid.archive import TransactionArchive
+from tests.fakes import FakePlaidClient, FakeSheetsService, make_response
+
+
+def test_archive_round_trip(tmp_path):
+    rng = random.Random(0)
+    archive = TransactionArchive(str(tmp_path))
+    appended = [make_response(rng, item_id, 5) for item_id in ('b', 'a', 'b')]
+    for response, institution in appended:
+        archive.append(response, institution, 30)
+
+    records = list(archive.iter_records())
+    assert [(record['response'], record['institution']) for record in records] == appended
+    assert [record['archived_at'] for record in records] == sorted(record['archived_at'] for record in records)
+    assert archive.item_ids() == ['a', 'b']
+    assert [len(os.listdir(tmp_path / item_id)) for item_id in ('a', 'b')] == [1, 2]
+    assert not any(name.endswith('.tmp') for item_id in ('a', 'b') for name in os.listdir(tmp_path / item_id))
+
+
+def sync_with_archive(tmp_path) -> tuple[FakeSheetsService, TransactionArchive]:
+    rng = random.Random(0)
+    sheets = FakeSheetsService()
+    archive = TransactionArchive(str(tmp_path))
+    for round_idx in range(3):
+        responses = {
+            f'access-sandbox-{item_id}': make_response(rng, item_id, rng.randint(1, 20), start=round_idx * 10)
+            for item_id in ('a', 'b')}
+        sync.sync_transactions(sheets, FakePlaidClient(responses), list(responses), 'spreadsheet', archive=archive)
+    return sheets, archive
+
+
+def test_replay_rebuilds_the_synced_sheet(tmp_path):
+    sheets, archive = sync_with_archive(tmp_path)
+    replayed = FakeSheetsService()
+    replayed.set_values([[f'old{col}' for col in range(40)] for _ in range(200)])
+
+    sync.replay_transactions(replayed, archive, 'spreadsheet')
+    assert replayed.sheet_values() == [row for row in sheets.sheet_values() if row]
+
+
+def test_failed_replay_leaves_the_sheet_as_it_was(monkeypatch, tmp_path):
+    sheets, archive = sync_with_archive(tmp_path)
+    before = sheets.sheet_values()
+
+    def fail(*args, **kwargs):
+        raise ConnectionError('Sheets is down')
+    monkeypatch.setattr(sync, 'fill_gsheet', fail)
+    with pytest.raises(ConnectionError):
+        sync.replay_transactions(sheets, archive, 'spreadsheet')
+    assert sheets.sheet_values() == before
@@ -0,0 +1,98 @@
+import random
+from datetime import date
+
+import pytest
+
+from gsheets_plaid import sync
+from gsheets_plaid.balances import BALANCE_COLS, balance_rows, new_balance_rows
+from gsheets_plaid.checkpoint import SyncCheckpoint
+from tests.fakes import FakePlaidClient, FakeSheetsService, make_response
+
+
+def make_responses(rng: random.Random, balance: float = 100.0) -> dict[str, tuple[dict, dict]]:
+    responses = {}
+    for item_id in ('a', 'b'):
+        response, institution = make_response(rng, item_id, 5)
+        for account in response['accounts']:
+            account['balances']['current'] = balance
+        responses[f'access-sandbox-{item_id}'] = (response, institution)
+    return responses
+
+
+def set_today(monkeypatch, today: date) -> None:
+    class FixedDate(date):
+        @classmethod
+        def today(cls) -> date:
+            return today
+    monkeypatch.setattr(sync, 'date', FixedDate)
+
+
+def balances(sheets: FakeSheetsService) -> list[list[str]]:
+    header, *rows = sheets.sheet_values('Balances')
+    assert header == BALANCE_COLS
+    return rows
+
+
+def test_balance_rows_keep_the_first_snapshot_of_each_day():
+    response, institution = make_response(random.Random(0), 'a', 0)
+    response['accounts'][0]['balances'] = {'current': None, 'unofficial_currency_code': 'BTC'}
+    rows = balance_rows(response, institution, date(2024, 3, 1))
+    assert rows[0] == ['2024-03-01', 'a-account0', 'Account 0', 'Bank a', '', '', 'BTC']
+    assert rows[1] == ['2024-03-01', 'a-account1', 'Account 1', 'Bank a', 100.0, '', 'USD']
+
+    later_rows = balance_rows(response, institution, date(2024, 3, 2))
+    assert new_balance_rows(rows + rows + later_rows, {('2024-03-01', 'a-account2')}) == rows[:2] + later_rows
+
+
+@pytest.mark.parametrize('differential', [False, True])
+def test_first_sync_adds_the_balances_sheet(monkeypatch, differential):
+    set_today(monkeypatch, date(2024, 3, 1))
+    responses = make_responses(random.Random(0))
+    sheets = FakeSheetsService()
+    sync.sync_transactions(
+        sheets, FakePlaidClient(responses), list(responses), 'spreadsheet', differential=differential,
+        balances_sheet='Balances')
+
+    rows = balances(sheets)
+    assert [row[:2] for row in rows] == [
+        ['2024-03-01', f'{item_id}-account{idx}'] for item_id in ('a', 'b') for idx in range(3)]
+
+
+def test_syncs_on_the_same_day_add_one_row_per_account(monkeypatch):
+    rng = random.Random(0)
+    sheets = FakeSheetsService()
+    for today, balance in [(date(2024, 3, 1), 100.0), (date(2024, 3, 1), 250.0), (date(2024, 3, 2), 300.0)]:
+        set_today(monkeypatch, today)
+        responses = make_responses(rng, balance)
+        sync.sync_transactions(
+            sheets, FakePlaidClient(responses), list(responses), 'spreadsheet', balances_sheet='Balances')
+
+    rows = balances(sheets)
+    current_idx = BALANCE_COLS.index('current')
+    assert len(rows) == 12
+    assert {(row[0], row[current_idx]) for row in rows} == {('2024-03-01', '100.0'), ('2024-03-02', '300.0')}
+
+
+@pytest.mark.parametrize('failing_step', ['read_gsheet_transactions', 'fill_gsheet'])
+def test_resumed_sync_does_not_duplicate_balances(monkeypatch, tmp_path, failing_step):
+    set_today(monkeypatch, date(2024, 3, 1))
+    responses = make_responses(random.Random(0))
+    sheets = FakeSheetsService()
+    checkpoint = SyncCheckpoint('run', directory=str(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise ConnectionError('Sheets is down')
+    with monkeypatch.context() as patch:
+        patch.setattr(sync, failing_step, fail)
+        with pytest.raises(ConnectionError):
+            sync.sync_transactions(
+                sheets, FakePlaidClient(responses), list(responses), 'spreadsheet', checkpoint=checkpoint,
+                balances_sheet='Balances')
+    assert len(balances(sheets)) == 6
+
+    plaid_client = FakePlaidClient(responses)
+    sync.sync_transactions(
+        sheets, plaid_client, list(responses), 'spreadsheet', checkpoint=checkpoint, balances_sheet='Balances')
+    assert len(balances(sheets)) == 6
+    assert plaid_client.calls == []
+    assert not checkpoint.has('merged')
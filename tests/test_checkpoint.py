@@ -0,0 +1,89 @@
+import os
+import random
+import time
+
+import pytest
+
+from gsheets_plaid import checkpoint, cli, services, sync
+from gsheets_plaid.checkpoint import SyncCheckpoint, prune_checkpoints
+from tests.fakes import FakePlaidClient, FakeSheetsService, make_response
+
+
+@pytest.fixture
+def fake_services(monkeypatch, tmp_path):
+    """Point run_sync at a fake sheet, a new fake Plaid client per run and a
+    temporary checkpoint directory. Returns the sheet and the Plaid clients.
+    """
+    rng = random.Random(0)
+    responses = {f'access-sandbox-{item_id}': make_response(rng, item_id, 10) for item_id in ('a', 'b')}
+    sheets = FakeSheetsService()
+    plaid_clients = []
+
+    def generate_plaid_client(*args) -> FakePlaidClient:
+        plaid_clients.append(FakePlaidClient(responses))
+        return plaid_clients[-1]
+    monkeypatch.setattr(services, 'generate_gsheets_service', lambda credentials: sheets)
+    monkeypatch.setattr(services, 'generate_plaid_client', generate_plaid_client)
+    monkeypatch.setattr(checkpoint, 'DEFAULT_CHECKPOINT_DIR', str(tmp_path))
+    return sheets, plaid_clients
+
+
+def sync_config(**options) -> dict:
+    return dict({
+        'plaid_env': 'sandbox',
+        'plaid_client_id': 'client-id',
+        'plaid_secret': 'secret',
+        'google_credentials': '{}',
+        'spreadsheet_id': 'spreadsheet',
+        'plaid_access_tokens': 'access-sandbox-a, access-sandbox-b',
+    }, **options)
+
+
+@pytest.mark.parametrize('failing_step', ['fill_gsheet', 'apply_gsheet_formatting'])
+def test_rerun_resumes_a_failed_sync_without_calling_plaid(monkeypatch, tmp_path, fake_services, failing_step):
+    sheets, plaid_clients = fake_services
+
+    def fail(*args, **kwargs):
+        raise ConnectionError('Sheets is down')
+    with monkeypatch.context() as patch:
+        patch.setattr(sync, failing_step, fail)
+        with pytest.raises(ConnectionError):
+            cli.run_sync(sync_config())
+    assert len(os.listdir(tmp_path)) == 1
+    sheet_writes = sheets.calls.count('values.update')
+
+    cli.run_sync(sync_config())
+    assert plaid_clients[0].calls
+    assert plaid_clients[1].calls == []
+    assert len(sheets.sheet_values()) == 21
+    if failing_step == 'apply_gsheet_formatting':
+        assert sheets.calls.count('values.update') == sheet_writes
+    assert os.listdir(tmp_path) == []
+
+
+def test_sync_with_other_settings_starts_a_new_run(monkeypatch, fake_services):
+    sheets, plaid_clients = fake_services
+    with monkeypatch.context() as patch:
+        patch.setattr(sync, 'fill_gsheet', lambda *args, **kwargs: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            cli.run_sync(sync_config(), num_days=30)
+        run_id = os.listdir(checkpoint.DEFAULT_CHECKPOINT_DIR)[0]
+
+    with pytest.raises(ValueError):
+        cli.run_sync(sync_config(), num_days=60, run_id=run_id)
+    cli.run_sync(sync_config(), num_days=60)
+    assert plaid_clients[-1].calls
+    assert os.listdir(checkpoint.DEFAULT_CHECKPOINT_DIR) == [run_id]
+
+
+def test_prune_checkpoints_deletes_old_runs(tmp_path):
+    old_run = SyncCheckpoint('old', directory=str(tmp_path))
+    old_run.save('merged', ['transactions'])
+    new_run = SyncCheckpoint('new', directory=str(tmp_path))
+    new_run.save('merged', ['transactions'])
+    last_week = time.time() - 8 * 24 * 60 * 60
+    os.utime(old_run.path, (last_week, last_week))
+
+    prune_checkpoints(str(tmp_path))
+    assert os.listdir(tmp_path) == ['new']
+    prune_checkpoints(str(tmp_path / 'missing'))
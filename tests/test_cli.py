@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from gsheets_plaid.cli import REQUIRED_REPLAY_CONFIG_KEYS, SYNC_CONFIG_ENV_VARIABLES, get_access_tokens, load_sync_config
+
+
+@pytest.fixture(autouse=True)
+def clear_env(monkeypatch):
+    for env_variable in SYNC_CONFIG_ENV_VARIABLES.values():
+        monkeypatch.delenv(env_variable, raising=False)
+
+
+def write_config(tmp_path, config: dict) -> str:
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_load_sync_config_fills_missing_values_from_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv('PLAID_CLIENT_ID', 'env-client-id')
+    monkeypatch.setenv('PLAID_SECRET', 'env-secret')
+    monkeypatch.setenv('SPREADSHEET_ID', 'env-spreadsheet')
+    config_path = write_config(tmp_path, {
+        'plaid_client_id': 'file-client-id',
+        'google_credentials': {'token': 'file-token'},
+        'plaid_items': {'item': 'access-sandbox-item'},
+    })
+
+    config = load_sync_config(config_path)
+    assert config == {
+        'plaid_client_id': 'file-client-id',
+        'plaid_secret': 'env-secret',
+        'google_credentials': {'token': 'file-token'},
+        'spreadsheet_id': 'env-spreadsheet',
+        'plaid_items': {'item': 'access-sandbox-item'},
+        'plaid_env': 'sandbox',
+    }
+
+
+def test_load_sync_config_from_the_environment_only(monkeypatch):
+    for key in ('plaid_env', 'plaid_client_id', 'plaid_secret', 'google_credentials', 'spreadsheet_id'):
+        monkeypatch.setenv(SYNC_CONFIG_ENV_VARIABLES[key], f'env-{key}')
+    assert load_sync_config()['plaid_env'] == 'env-plaid_env'
+
+
+def test_load_sync_config_lists_the_missing_settings(monkeypatch, tmp_path):
+    monkeypatch.setenv('PLAID_SECRET', '')
+    config_path = write_config(tmp_path, {'plaid_client_id': 'client-id', 'spreadsheet_id': ''})
+    with pytest.raises(EnvironmentError) as error:
+        load_sync_config(config_path)
+    for name in ('plaid_secret', 'google_credentials', 'spreadsheet_id', 'PLAID_SECRET', 'GOOGLE_CREDENTIALS'):
+        assert name in str(error.value)
+    assert 'plaid_client_id' not in str(error.value)
+
+    config = load_sync_config(
+        write_config(tmp_path, {'google_credentials': 'token.json', 'spreadsheet_id': 'spreadsheet'}),
+        REQUIRED_REPLAY_CONFIG_KEYS)
+    assert config['spreadsheet_id'] == 'spreadsheet'
+
+
+@pytest.mark.parametrize('access_tokens', [
+    ' access-sandbox-1,access-development-2, ,access-sandbox-3 ',
+    ['access-sandbox-1', 'access-development-2', 'access-sandbox-3'],
+])
+def test_get_access_tokens_merges_and_filters_by_environment(access_tokens):
+    config = {
+        'plaid_env': 'sandbox',
+        'plaid_access_tokens': access_tokens,
+        'plaid_items': {'item4': 'Access-Sandbox-4', 'item5': 'access-production-5'},
+    }
+    assert get_access_tokens(config) == ['access-sandbox-1', 'access-sandbox-3', 'Access-Sandbox-4']
+    assert get_access_tokens(dict(config, plaid_env='development')) == ['access-development-2']
+
+
+def test_get_access_tokens_from_the_environment(monkeypatch):
+    monkeypatch.setenv('PLAID_ACCESS_TOKENS', 'access-sandbox-1,access-sandbox-2')
+    monkeypatch.setenv('GOOGLE_CREDENTIALS', 'token.json')
+    monkeypatch.setenv('SPREADSHEET_ID', 'spreadsheet')
+    monkeypatch.setenv('PLAID_CLIENT_ID', 'client-id')
+    monkeypatch.setenv('PLAID_SECRET', 'secret')
+    assert get_access_tokens(load_sync_config()) == ['access-sandbox-1', 'access-sandbox-2']
+    assert get_access_tokens({'plaid_env': 'sandbox'}) == []
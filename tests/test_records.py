@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from gsheets_plaid import sync
+from tests.fakes import FakePlaidClient, FakeSheetsService, make_response
+
+
+def sync_rounds(monkeypatch, small_sync_max_rows: int, rounds: list[dict]) -> list[list[list[str]]]:
+    """Run a sync per round of responses and return the sheet after each.
+    """
+    monkeypatch.setattr(sync, 'SMALL_SYNC_MAX_ROWS', small_sync_max_rows)
+    sheets = FakeSheetsService()
+    snapshots = []
+    for responses in rounds:
+        sync.sync_transactions(sheets, FakePlaidClient(responses), list(responses), 'spreadsheet')
+        snapshots.append(sheets.sheet_values())
+    return snapshots
+
+
+def assert_same_sheets(monkeypatch, rounds: list[dict]) -> list[list[list[str]]]:
+    records_sheets = sync_rounds(monkeypatch, 10 ** 9, rounds)
+    pandas_sheets = sync_rounds(monkeypatch, 0, rounds)
+    assert records_sheets == pandas_sheets
+    return records_sheets
+
+
+def test_blank_padding_rows_keep_pending_as_boolean(monkeypatch):
+    rng = random.Random(0)
+    rounds = [
+        {'access-sandbox-a': make_response(rng, 'a', 10, pending_fraction=1)},
+        {'access-sandbox-a': make_response(rng, 'a', 3, start=100, pending_fraction=0)},
+    ]
+    sheets = assert_same_sheets(monkeypatch, rounds)
+
+    header, *rows = sheets[-1]
+    pending_idx = header.index('pending')
+    assert len(rows) == 3
+    assert all(row[pending_idx] == 'FALSE' for row in rows)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_records_and_pandas_paths_write_the_same_rows(monkeypatch, seed):
+    rng = random.Random(seed)
+    item_ids = [f'item{idx}' for idx in range(rng.randint(1, 3))]
+    rounds = [
+        {f'access-sandbox-{item_id}': make_response(rng, item_id, rng.randint(1, 30), start=round_idx * 10)
+         for item_id in item_ids}
+        for round_idx in range(3)]
+    assert_same_sheets(monkeypatch, rounds)
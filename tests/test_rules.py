@@ -0,0 +1,83 @@
+import random
+import re
+
+import numpy as np
+import pytest
+
+from gsheets_plaid.rules import RULE_TEXT_FIELDS, CategoryRule, RuleSet, build_rules
+
+WORDS = ['uber', 'starbucks', 'amazon', 'whole foods', 'trader joe', 'rent', 'payroll', 'a.b', 'x+y']
+
+
+def categorize_sequentially(rules: list[CategoryRule], texts: dict[str, list[str]], amounts: np.ndarray) -> list:
+    categories = []
+    for row, amount in enumerate(amounts):
+        row_texts = {field: texts[field][row] for field in RULE_TEXT_FIELDS}
+        categories.append(next((rule.category for rule in rules if rule.matches(row_texts, amount)), None))
+    return categories
+
+
+def categorize(rules: list[CategoryRule], texts: dict[str, list[str]], amounts: list[float]) -> list:
+    return list(RuleSet(rules).categorize(texts, np.array(amounts, dtype=float)))
+
+
+def random_pattern(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.4:
+        return re.escape(rng.choice(WORDS))
+    if kind < 0.6:
+        return '|'.join(re.escape(word) for word in rng.sample(WORDS, 2))
+    if kind < 0.8:
+        return '^' + re.escape(rng.choice(WORDS)) + rng.choice(['', '$'])
+    return rng.choice(['grocer(y|ies)', r'\d{4}', 'star.*s', 'foods?$'])
+
+
+def random_rule(rng: random.Random, idx: int) -> CategoryRule:
+    options = {}
+    for field in rng.sample(RULE_TEXT_FIELDS, rng.choice([0, 1, 1, 1, 2])):
+        options[field] = random_pattern(rng)
+    if rng.random() < 0.3:
+        options['min_amount'] = rng.randint(-50, 50)
+        options['max_amount'] = options['min_amount'] + rng.randint(0, 100)
+    return CategoryRule(f'Category {idx}', **options)
+
+
+def random_text(rng: random.Random) -> str:
+    words = rng.sample(WORDS + ['grocery', 'store 1234', 'foods', 'STARBUCKS', 'Uber Eats'], rng.randint(0, 3))
+    return ' '.join(words)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_rule_set_matches_rules_checked_in_order(seed):
+    rng = random.Random(seed)
+    rules = [random_rule(rng, idx) for idx in range(rng.randint(1, 40))]
+    num_rows = 300
+    texts = {field: [random_text(rng) for _ in range(num_rows)] for field in RULE_TEXT_FIELDS}
+    amounts = [rng.choice([rng.uniform(-100, 150), np.nan]) for _ in range(num_rows)]
+    assert categorize(rules, texts, amounts) == categorize_sequentially(rules, texts, np.array(amounts))
+
+
+@pytest.mark.parametrize('pattern, value', [
+    ('i', 'İSTANBUL'),
+    ('^istanbul$', 'İstanbul'),
+    ('s', 'ſ'),
+    ('k', 'K'),
+    ('ss', 'ß'),
+    ('ß', 'SS'),
+    ('straße', 'STRASSE'),
+    ('café', 'CAFÉ'),
+    ('café|bar', 'Le Café'),
+])
+def test_rule_set_folds_case_like_the_rules(pattern, value):
+    rules = [CategoryRule('Match', name=pattern)]
+    texts = {'name': [value], 'merchant_name': [''], 'account_name': ['']}
+    assert categorize(rules, texts, [0.0]) == categorize_sequentially(rules, texts, np.array([0.0]))
+
+
+def test_build_rules_rejects_invalid_rules():
+    with pytest.raises(ValueError):
+        build_rules([{'merchant_name': 'uber'}])
+    with pytest.raises(ValueError):
+        build_rules([{'category': 'Travel', 'merchant': 'uber'}])
+    with pytest.raises(ValueError):
+        build_rules([{'category': 'Travel', 'name': 'uber('}])
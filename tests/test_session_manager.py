@@ -0,0 +1,81 @@
+import sqlite3
+
+from flask import Flask
+
+from gsheets_plaid.web_server import session_manager
+from gsheets_plaid.web_server.session_manager import FirestoreSessionManager, SQLiteSessionManager
+from tests.fakes import FakeFirestoreClient
+
+
+def test_firestore_session_is_recreated_after_another_worker_deletes_it():
+    app = Flask(__name__)
+    documents = {}
+    workers = [FirestoreSessionManager(FakeFirestoreClient(documents)) for _ in range(2)]
+
+    for worker in workers:
+        with app.test_request_context():
+            worker.register_user_id('user')
+            worker['spreadsheet_id'] = 'spreadsheet'
+
+    with app.test_request_context():
+        workers[0].register_user_id('user')
+        workers[0].delete_session()
+
+    with app.test_request_context():
+        workers[1].register_user_id('user')
+        assert workers[1].get_session() == {}
+
+
+def test_sqlite_session_cookie_is_an_opaque_session_id(tmp_path):
+    app = Flask(__name__)
+    manager = SQLiteSessionManager(str(tmp_path / 'sessions.db'))
+    with app.test_request_context():
+        session_id = manager.start_session('google-sub')
+        manager['plaid_items'] = {'item': 'access-sandbox-token'}
+        manager.flush()
+    assert 'google-sub' not in session_id
+
+    with app.test_request_context():
+        assert not manager.resume_session('google-sub')
+        assert manager.user_id is None
+    with app.test_request_context():
+        assert manager.resume_session(session_id)
+        assert manager['plaid_items'] == {'item': 'access-sandbox-token'}
+
+    with app.test_request_context():
+        manager.end_session(session_id)
+        assert not manager.resume_session(session_id)
+
+
+def test_sqlite_delete_session_ends_every_session_of_the_user(tmp_path):
+    app = Flask(__name__)
+    manager = SQLiteSessionManager(str(tmp_path / 'sessions.db'))
+    with app.test_request_context():
+        session_ids = [manager.start_session('google-sub') for _ in range(2)]
+        manager.delete_session()
+    with app.test_request_context():
+        assert not any(manager.resume_session(session_id) for session_id in session_ids)
+
+
+def test_sqlite_session_ids_expire(monkeypatch, tmp_path):
+    app = Flask(__name__)
+    manager = SQLiteSessionManager(str(tmp_path / 'sessions.db'), max_age=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(session_manager.time, 'time', lambda: now)
+    with app.test_request_context():
+        old_session_ids = [manager.start_session(user_id) for user_id in ('user', 'other-user')]
+
+    now += 30
+    with app.test_request_context():
+        assert manager.resume_session(old_session_ids[0])
+    now += 31
+    with app.test_request_context():
+        assert not manager.resume_session(old_session_ids[0])
+        assert manager.user_id is None
+        new_session_id = manager.start_session('user')
+    with app.test_request_context():
+        assert manager.resume_session(new_session_id)
+
+    # Signing in deletes every expired session id
+    with sqlite3.connect(tmp_path / 'sessions.db') as conn:
+        assert [row[0] for row in conn.execute('SELECT session_id FROM session_ids')] == [new_session_id]
@@ -0,0 +1,80 @@
+import csv
+import random
+import sqlite3
+
+import pytest
+
+from gsheets_plaid import sync
+from gsheets_plaid.records import TransactionTable
+from gsheets_plaid.sinks import CSVSink, SQLiteSink, TransactionSink, write_to_sinks
+from tests.fakes import FakePlaidClient, FakeSheetsService, make_response
+
+COLUMNS = ['transaction_id', 'pending', 'item_id', 'amount']
+
+
+class FailingSink(TransactionSink):
+    def __init__(self, fail_on: str) -> None:
+        self.fail_on = fail_on
+
+    def open(self, columns: list[str]) -> None:
+        super().open(columns)
+        if self.fail_on == 'open':
+            raise RuntimeError('open failed')
+
+    def write(self, rows: list[list]) -> None:
+        if self.fail_on == 'write':
+            raise RuntimeError('write failed')
+
+
+def read_csv(path) -> list[list[str]]:
+    with open(path, newline='') as file:
+        return list(csv.reader(file))
+
+
+def test_sinks_match_the_sheet(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from gsheets_plaid.sinks import ParquetSink
+
+    rng = random.Random(0)
+    sheets = FakeSheetsService()
+    for round_idx in range(3):
+        responses = {
+            f'access-sandbox-{item_id}': make_response(rng, item_id, 20, start=round_idx * 7)
+            for item_id in ('a', 'b')}
+        sinks = [
+            CSVSink(str(tmp_path / 'transactions.csv')),
+            ParquetSink(str(tmp_path / 'transactions.parquet')),
+            SQLiteSink(str(tmp_path / 'transactions.db')),
+        ]
+        sync.sync_transactions(sheets, FakePlaidClient(responses), list(responses), 'spreadsheet', sinks=sinks)
+
+    header, *rows = sheets.sheet_values()
+    transaction_ids = sorted(row[0] for row in rows if row)
+    assert sorted(row[0] for row in read_csv(tmp_path / 'transactions.csv')[1:]) == transaction_ids
+    assert sorted(pq.read_table(tmp_path / 'transactions.parquet')['transaction_id'].to_pylist()) == transaction_ids
+    with sqlite3.connect(tmp_path / 'transactions.db') as conn:
+        assert sorted(row[0] for row in conn.execute('SELECT transaction_id FROM transactions')) == transaction_ids
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'transactions.csv', 'transactions.db', 'transactions.parquet']
+
+
+@pytest.mark.parametrize('fail_on', ['open', 'write'])
+def test_failed_write_leaves_the_sinks_unchanged(tmp_path, fail_on):
+    csv_path = tmp_path / 'transactions.csv'
+    db_path = tmp_path / 'transactions.db'
+    write_to_sinks(
+        TransactionTable(COLUMNS, [['t1', True, 'a', 1.5], ['t2', False, 'a', 2.0]]),
+        [CSVSink(str(csv_path)), SQLiteSink(str(db_path))])
+    before_csv = read_csv(csv_path)
+    with sqlite3.connect(db_path) as conn:
+        before_db = sorted(conn.execute('SELECT * FROM transactions'))
+
+    with pytest.raises(RuntimeError):
+        write_to_sinks(
+            TransactionTable(COLUMNS, [['t3', False, 'a', 3.0]]),
+            [CSVSink(str(csv_path)), SQLiteSink(str(db_path)), FailingSink(fail_on)])
+
+    assert read_csv(csv_path) == before_csv
+    with sqlite3.connect(db_path) as conn:
+        assert sorted(conn.execute('SELECT * FROM transactions')) == before_db
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['transactions.csv', 'transactions.db']
@@ -0,0 +1,123 @@
+import asyncio
+import random
+
+import pytest
+
+from gsheets_plaid import sync
+from tests.fakes import FakePlaidClient, FakeSheetsService, make_response
+
+
+def make_sheet(num_rows: int, blank_rows: set[int] = frozenset()) -> FakeSheetsService:
+    """A sheet with a header and ``num_rows`` rows below it, where the rows
+    at the ``blank_rows`` positions are empty.
+    """
+    sheets = FakeSheetsService()
+    rows = [[] if idx in blank_rows else [f'id{idx}', 'FALSE', 'item'] for idx in range(num_rows)]
+    sheets.set_values([['transaction_id', 'pending', 'item_id'], *rows])
+    return sheets
+
+
+def read_rows(sheets: FakeSheetsService, **kwargs) -> list[list[str]]:
+    header = sync.get_gsheet_header(sheets, 'spreadsheet')
+    return [row for rows in sync.iter_gsheet_rows(sheets, 'spreadsheet', header, **kwargs) for row in rows]
+
+
+def test_iter_gsheet_rows_reads_past_a_blank_row_at_the_end_of_a_chunk():
+    sheets = make_sheet(15, blank_rows={9})
+    rows = read_rows(sheets, chunk_size=10, chunks_per_request=1)
+    assert rows == sheets.sheet_values()[1:]
+    assert len(rows) == 15
+
+
+def test_iter_gsheet_rows_reads_past_blank_chunks():
+    sheets = make_sheet(45, blank_rows=set(range(8, 30)))
+    rows = read_rows(sheets, chunk_size=10, chunks_per_request=2)
+    assert rows == sheets.sheet_values()[1:]
+    assert rows[8:30] == [[]] * 22
+
+
+def test_iter_gsheet_rows_drops_trailing_blank_rows():
+    sheets = make_sheet(12, blank_rows={10, 11})
+    assert read_rows(sheets, chunk_size=5, chunks_per_request=1) == sheets.sheet_values()[1:]
+    assert len(read_rows(sheets, chunk_size=5)) == 10
+
+
+def test_iter_gsheet_rows_stops_at_the_row_count():
+    rng = random.Random(0)
+    sheets = make_sheet(2500, blank_rows=set(rng.sample(range(2500), 300)))
+    requests_before = sheets.calls.count('values.batchGet')
+    rows = read_rows(sheets, chunk_size=100, chunks_per_request=4)
+    assert rows == sheets.sheet_values()[1:]
+    # The grid has 2501 rows, which takes 25 chunks of 100 rows in 7 requests
+    assert sheets.calls.count('values.batchGet') - requests_before == 7
+
+
+@pytest.mark.parametrize('num_new_rows, small', [(0, True), (sync.SMALL_SYNC_MAX_ROWS, False)])
+def test_read_gsheet_transactions_picks_the_pipeline_before_reading(num_new_rows, small):
+    sheets = make_sheet(40, blank_rows={5, 39})
+    header = sync.get_gsheet_header(sheets, 'spreadsheet')
+    calls_before = len(sheets.calls)
+    transactions = sync.read_gsheet_transactions(sheets, 'spreadsheet', header, num_new_rows)
+
+    # The grid has 1000 rows, so 999 existing rows are assumed before reading
+    assert isinstance(transactions, sync.TransactionTable) == small
+    assert sheets.calls[calls_before:] == ['get', 'values.batchGet']
+    if small:
+        rows = [['' if cell is None else cell for cell in row] for row in transactions.rows]
+    else:
+        rows = transactions.fillna('').to_numpy().tolist()
+    expected = sync.transaction_table_from_values(sheets.sheet_values()).rows
+    assert rows == [['' if cell is None else cell for cell in row] for row in expected]
+
+
+def test_get_transactions_from_gsheet_parses_each_chunk_as_it_is_read(monkeypatch):
+    sheets = make_sheet(25)
+    parsed_chunks = []
+
+    def parse_chunk(header, rows, columns=None):
+        parsed_chunks.append(len(rows))
+        return transactions_frame_from_rows(header, rows, columns)
+    transactions_frame_from_rows = sync.transactions_frame_from_rows
+    monkeypatch.setattr(sync, 'transactions_frame_from_rows', parse_chunk)
+
+    frames = sync.iter_transactions_from_gsheet(sheets, 'spreadsheet', chunk_size=10)
+    assert len(next(frames)) == 10
+    assert parsed_chunks == [10]
+    assert [len(frame) for frame in frames] == [10, 5]
+    assert len(sync.get_transactions_from_gsheet(sheets, 'spreadsheet')) == 25
+
+
+def sheet_rows_by_id(sheets: FakeSheetsService) -> dict[str, dict[str, str]]:
+    header, *rows = sheets.sheet_values()
+    records = [dict(zip(header, row)) for row in rows if row]
+    return {record['transaction_id']: record for record in records}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_differential_sync_keeps_the_same_transactions_as_a_full_sync(seed):
+    rng = random.Random(seed)
+    item_ids = [f'item{idx}' for idx in range(rng.randint(1, 3))]
+    full_sheets = FakeSheetsService()
+    differential_sheets = FakeSheetsService()
+    for round_idx in range(4):
+        responses = {
+            f'access-sandbox-{item_id}': make_response(rng, item_id, rng.randint(1, 20), start=round_idx * 10)
+            for item_id in item_ids}
+        plaid_client = FakePlaidClient(responses)
+        sync.sync_transactions(full_sheets, plaid_client, list(responses), 'spreadsheet')
+        sync.sync_transactions(differential_sheets, plaid_client, list(responses), 'spreadsheet', differential=True)
+        assert sheet_rows_by_id(differential_sheets) == sheet_rows_by_id(full_sheets)
+
+
+def test_fetch_transactions_is_for_synchronous_callers():
+    rng = random.Random(0)
+    responses = {f'access-sandbox-{item_id}': make_response(rng, item_id, 5) for item_id in ('a', 'b')}
+    plaid_client = FakePlaidClient(responses)
+    assert sync.fetch_transactions(plaid_client, list(responses)) == list(responses.values())
+
+    async def fetch_from_event_loop() -> list:
+        with pytest.raises(RuntimeError):
+            sync.fetch_transactions(plaid_client, list(responses))
+        return await sync.request_all_transactions(plaid_client, list(responses))
+
+    assert asyncio.run(fetch_from_event_loop()) == list(responses.values())
@@ -0,0 +1,124 @@
+import random
+import threading
+
+import pytest
+
+from gsheets_plaid.web_server.session_manager import SESSION_MAX_AGE, SQLiteSessionManager
+from tests.fakes import FakePlaidClient, FakeResponse, make_response
+
+
+@pytest.fixture
+def web(monkeypatch, tmp_path):
+    """The web server with a fresh SQLite session store, Google sign-in that
+    accepts any token as the user id, and a fake Plaid client with two
+    items. Returns the server module, a test client and the Plaid client.
+    """
+    for env_variable in ('GOOGLE_CLOUD_CLIENT_ID', 'GOOGLE_CLOUD_CLIENT_CONFIG', 'FLASK_SECRET_KEY'):
+        monkeypatch.setenv(env_variable, 'test')
+    monkeypatch.setenv('GOOGLE_APPLICATION_CREDENTIALS', str(tmp_path / 'credentials.json'))
+    monkeypatch.delenv('GOOGLE_CLOUD_PROJECT', raising=False)
+    monkeypatch.setenv('GSHEETS_PLAID_SESSION_BACKEND', 'sqlite')
+    monkeypatch.setenv('GSHEETS_PLAID_SESSION_DB', str(tmp_path / 'sessions.db'))
+    from gsheets_plaid.web_server import main as web_server
+
+    rng = random.Random(0)
+    plaid_client = FakePlaidClient(
+        {f'access-sandbox-{item_id}': make_response(rng, item_id, 5) for item_id in ('a', 'b', 'c')})
+    monkeypatch.setattr(web_server, 'session_manager', SQLiteSessionManager(str(tmp_path / 'sessions.db')))
+    monkeypatch.setattr(web_server, 'generate_plaid_client', lambda *args: plaid_client)
+    monkeypatch.setattr(
+        web_server.id_token, 'verify_oauth2_token',
+        lambda token, request, audience: {'sub': token, 'given_name': 'Test'})
+    return web_server, web_server.app.test_client(), plaid_client
+
+
+def test_session_cookie_expires_and_is_only_sent_over_https(web):
+    web_server, client, _ = web
+    resp = client.get('/sign-in-with-google-callback?jwt=google-sub')
+    cookie = resp.headers['Set-Cookie']
+    assert cookie.startswith('session_id=')
+    assert 'google-sub' not in cookie
+    for attribute in (f'Max-Age={SESSION_MAX_AGE}', 'Secure', 'HttpOnly', 'SameSite=Lax'):
+        assert attribute in cookie.split('; ')
+    assert client.get('/').status_code == 200
+
+    web_server.session_manager.max_age = -1
+    resp = client.get('/')
+    assert resp.status_code == 302
+    assert resp.location.endswith('/login')
+
+
+def sign_in_and_link_items(client, item_ids: list[str]) -> None:
+    client.get('/sign-in-with-google-callback?jwt=google-sub')
+    client.post('/edit-plaid-credentials', data={'plaid_client_id': 'client-id', 'plaid_secret': 'secret'})
+    for item_id in item_ids:
+        client.get(f'/plaid-link-success?public_token=public-sandbox-{item_id}')
+
+
+def test_manage_plaid_items_requests_the_link_token_alongside_the_items(web):
+    _, client, plaid_client = web
+    sign_in_and_link_items(client, ['a', 'b'])
+
+    # The link token request only returns once an item is being looked up,
+    # so this would time out if the two weren't in flight at the same time
+    item_looked_up = threading.Event()
+    item_get = plaid_client.item_get
+
+    def item_get_and_signal(request):
+        item_looked_up.set()
+        return item_get(request)
+
+    def link_token_create(request):
+        plaid_client.calls.append('link_token_create')
+        assert item_looked_up.wait(timeout=5)
+        return FakeResponse({'link_token': 'link-sandbox-token'})
+    plaid_client.item_get = item_get_and_signal
+    plaid_client.link_token_create = link_token_create
+    plaid_client.calls.clear()
+
+    resp = client.get('/manage-plaid-items')
+    assert resp.status_code == 200
+    assert b'Bank a' in resp.data and b'Bank b' in resp.data
+    assert 'institutions_get' not in plaid_client.calls
+    assert plaid_client.calls.count('item_get') == 2
+
+
+def test_unchanged_dashboard_is_revalidated_without_calling_plaid(web):
+    _, client, plaid_client = web
+    sign_in_and_link_items(client, ['a'])
+    resp = client.get('/')
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+    plaid_client.calls.clear()
+
+    resp = client.get('/', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+    assert resp.headers['ETag'] == etag
+    assert client.get('/').headers['ETag'] == etag
+    assert plaid_client.calls == []
+
+
+def test_dashboard_etag_changes_with_the_items_and_credentials(monkeypatch, web):
+    web_server, client, plaid_client = web
+
+    class InvalidKeysPlaidClient:
+        def institutions_get(self, request):
+            raise web_server.PlaidApiException(status=400, reason='INVALID_API_KEYS')
+    monkeypatch.setattr(
+        web_server, 'generate_plaid_client',
+        lambda plaid_env, client_id, secret: plaid_client if secret == 'secret' else InvalidKeysPlaidClient())
+    sign_in_and_link_items(client, [])
+    etags = [client.get('/').headers['ETag']]
+
+    client.get('/plaid-link-success?public_token=public-sandbox-a')
+    etags.append(client.get('/').headers['ETag'])
+    client.get('/remove-plaid-item?access_token=access-sandbox-a')
+    etags.append(client.get('/').headers['ETag'])
+    client.post('/edit-plaid-credentials', data={'plaid_client_id': 'client-id', 'plaid_secret': 'revoked'})
+    etags.append(client.get('/').headers['ETag'])
+
+    for old_etag, new_etag in zip(etags, etags[1:]):
+        assert new_etag != old_etag
+        resp = client.get('/', headers={'If-None-Match': old_etag})
+        assert resp.status_code == 200